@@ -0,0 +1,133 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from .feeds import ChangeFeed
+from .models import Ingredient, StockAlert, StockAlertKind
+
+
+def record_stock_changes(changes):
+    """
+    Create alerts for ingredients whose stock crossed the minimum level.
+
+    ``changes`` is an iterable of ``(ingredient_id, previous_stock,
+    current_stock, minimum_stock_level)``; ``previous_stock`` is None for a
+    new ingredient. Dropping to or below the minimum raises a LOW_STOCK
+    alert, climbing back above it a RESTOCKED one.
+    """
+    alerts = []
+    for ingredient_id, previous, current, minimum in changes:
+        was_low = previous is not None and previous <= minimum
+        is_low = current <= minimum
+        if was_low == is_low:
+            continue
+        alerts.append(StockAlert(
+            ingredient_id=ingredient_id,
+            kind=StockAlertKind.LOW_STOCK if is_low else StockAlertKind.RESTOCKED,
+            stock_quantity=current,
+            minimum_stock_level=minimum
+        ))
+    return StockAlert.objects.bulk_create(alerts)
+
+
+def record_deductions(demand):
+    """
+    Detect low-stock crossings caused by subtracting ``demand``
+    (ingredient id -> quantity) with a single query over the rows that
+    are now low
+    """
+    now_low = Ingredient.objects.filter(
+        pk__in=list(demand),
+        stock_quantity__lte=F('minimum_stock_level')
+    ).values_list('pk', 'stock_quantity', 'minimum_stock_level')
+    return record_stock_changes(
+        (pk, stock + demand[pk], stock, minimum)
+        for pk, stock, minimum in now_low
+    )
+
+
+def check_ingredient(ingredient, created=False):
+    """
+    Alerts for a saved ingredient, compared with the values it was loaded with
+    """
+    previous_stock = None if created else getattr(ingredient, '_loaded_stock_quantity', None)
+    if previous_stock is not None or created:
+        record_stock_changes([(
+            ingredient.pk,
+            previous_stock,
+            ingredient.stock_quantity,
+            ingredient.minimum_stock_level
+        )])
+    if ingredient.is_expired() and ingredient.expiry_date != getattr(ingredient, '_loaded_expiry_date', None):
+        record_expired(Ingredient.objects.filter(pk=ingredient.pk))
+    ingredient._loaded_stock_quantity = ingredient.stock_quantity
+    ingredient._loaded_expiry_date = ingredient.expiry_date
+
+
+def record_expired(ingredients=None):
+    """
+    Create one EXPIRED alert per ingredient and expiry date for ingredients
+    that are past their expiry date
+    """
+    if ingredients is None:
+        ingredients = Ingredient.objects.all()
+    expired = (
+        ingredients
+        .filter(expiry_date__lt=timezone.localdate())
+        .exclude(
+            stock_alerts__kind=StockAlertKind.EXPIRED,
+            stock_alerts__expiry_date=F('expiry_date')
+        )
+        .values_list('pk', 'stock_quantity', 'minimum_stock_level', 'expiry_date')
+    )
+    return StockAlert.objects.bulk_create(
+        StockAlert(
+            ingredient_id=pk,
+            kind=StockAlertKind.EXPIRED,
+            stock_quantity=stock,
+            minimum_stock_level=minimum,
+            expiry_date=expiry_date
+        )
+        for pk, stock, minimum, expiry_date in expired
+    )
+
+
+def format_event(alert):
+    """
+    Server-Sent Events frame for one alert; the id lets clients resume
+    with Last-Event-ID
+    """
+    data = {
+        'id': alert.id,
+        'ingredient': alert.ingredient_id,
+        'ingredient_name': alert.ingredient.name,
+        'kind': alert.kind,
+        'kind_display': alert.get_kind_display(),
+        'stock_quantity': alert.stock_quantity,
+        'minimum_stock_level': alert.minimum_stock_level,
+        'expiry_date': alert.expiry_date,
+        'created_at': alert.created_at,
+    }
+    return f"id: {alert.id}\nevent: {alert.kind}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def latest_alert_id():
+    return await StockAlert.objects.order_by('-id').values_list('id', flat=True).afirst()
+
+
+feed = ChangeFeed(latest_alert_id)
+
+
+async def alert_events(after_id, keepalive=15):
+    """
+    Endless SSE stream of alerts newer than ``after_id``
+    """
+    while True:
+        alerts = StockAlert.objects.filter(id__gt=after_id).select_related('ingredient').order_by('id')
+        async for alert in alerts[:500]:
+            after_id = alert.id
+            yield format_event(alert)
+        if not await feed.wait(after_id, keepalive):
+            yield ": keepalive\n\n"
@@ -0,0 +1,224 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .exceptions import custom_exception_handler
+from .feeds import ChangeFeed
+from .models import ORDER_TRANSITIONS, Order, OrderStatus
+from .read_serializers import OrderValuesSerializer
+from .recipe_cache import attach_ingredient_stats
+from .views import SupplierViewSet, IngredientViewSet, MenuItemViewSet, OrderViewSet
+
+CHUNK_SIZE = 2000
+
+# Long-poll limits for the order change feed, in seconds
+ORDER_CHANGES_TIMEOUT = 25
+ORDER_CHANGES_MAX_TIMEOUT = 60
+ORDER_CHANGES_LIMIT = 500
+# A write that commits after a later one can land just behind a client's
+# cursor, so every response repeats the changes this far back; clients
+# skip rows whose version they already have
+ORDER_CHANGES_OVERLAP = timedelta(seconds=2)
+
+
+class AsyncReadView(View):
+    """
+    Async list/retrieve for a DRF viewset.
+
+    Reuses the viewset's queryset, filter backends, pagination and
+    serializer, so responses match the sync endpoints byte for byte, but
+    rows are fetched with the async ORM and no worker thread is held while
+    the database answers. Querysets must load everything the serializer
+    touches (select_related / prefetch_related / ``prepare``); lazy loads
+    are not allowed in async code.
+    """
+    viewset_class = None
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self, viewset):
+        return viewset.get_queryset()
+
+    async def prepare(self, objects):
+        """
+        Hook to load anything the serializer needs for ``objects``
+        """
+
+    async def get(self, request, pk=None):
+        drf_request = Request(request)
+        viewset = self.viewset_class(
+            request=drf_request,
+            format_kwarg=None,
+            action='list' if pk is None else 'retrieve',
+            args=(),
+            kwargs={'pk': pk} if pk is not None else {}
+        )
+        try:
+            if pk is None:
+                data = await self.list(viewset, drf_request)
+            else:
+                data = await self.retrieve(viewset, pk)
+        except APIException as exc:
+            response = custom_exception_handler(exc, {'view': viewset, 'request': drf_request})
+            return self.render(response.data, response.status_code)
+        return self.render(data)
+
+    async def list(self, viewset, drf_request):
+        # Filter validation may look up related rows, so run it in a thread
+        queryset = await sync_to_async(viewset.filter_queryset)(self.get_queryset(viewset))
+
+        paginator = viewset.paginator
+        page_size = paginator.get_page_size(drf_request) if paginator else None
+        if not page_size:
+            objects = [obj async for obj in queryset.aiterator(chunk_size=CHUNK_SIZE)]
+            await self.prepare(objects)
+            return viewset.get_serializer(objects, many=True).data
+
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        django_paginator.count = await queryset.acount()
+        page_number = paginator.get_page_number(drf_request, django_paginator)
+        try:
+            page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        page.object_list = [obj async for obj in page.object_list.aiterator(chunk_size=page_size)]
+        await self.prepare(page.object_list)
+        paginator.page = page
+        paginator.request = drf_request
+        data = viewset.get_serializer(page.object_list, many=True).data
+        return paginator.get_paginated_response(data).data
+
+    async def retrieve(self, viewset, pk):
+        try:
+            obj = await self.get_queryset(viewset).aget(pk=pk)
+        except (viewset.queryset.model.DoesNotExist, DjangoValidationError, ValueError):
+            raise NotFound()
+        await self.prepare([obj])
+        return viewset.get_serializer(obj).data
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            status=status,
+            content_type='application/json'
+        )
+
+
+class AsyncSupplierView(AsyncReadView):
+    viewset_class = SupplierViewSet
+
+
+class AsyncIngredientView(AsyncReadView):
+    viewset_class = IngredientViewSet
+
+    def get_queryset(self, viewset):
+        return viewset.get_queryset().select_related('supplier')
+
+
+class AsyncMenuItemView(AsyncReadView):
+    viewset_class = MenuItemViewSet
+
+    async def prepare(self, objects):
+        await sync_to_async(attach_ingredient_stats)(objects)
+
+
+class AsyncPendingOrderView(AsyncReadView):
+    """
+    Async counterpart of ``OrderViewSet.pending_orders`` (unfiltered and
+    unpaginated, like the sync action)
+    """
+    viewset_class = OrderViewSet
+
+    async def get(self, request):
+        drf_request = Request(request)
+        viewset = self.viewset_class(
+            request=drf_request,
+            format_kwarg=None,
+            action='pending_orders',
+            args=(),
+            kwargs={}
+        )
+        pending = (
+            viewset.queryset
+            .filter(status=OrderStatus.PENDING)
+            .select_related('menu_item')
+        )
+        objects = [order async for order in pending.aiterator(chunk_size=CHUNK_SIZE)]
+        return self.render(viewset.get_serializer(objects, many=True).data)
+
+
+async def latest_order_change():
+    return await Order.objects.order_by('-updated_at').values_list('updated_at', flat=True).afirst()
+
+
+order_feed = ChangeFeed(latest_order_change)
+
+
+class AsyncOrderChangesView(AsyncReadView):
+    """
+    Long-poll feed of order changes for kitchen screens.
+
+    Without ``?cursor=`` the open orders are returned. With the cursor of
+    a previous response the request waits (up to ``?timeout=`` seconds)
+    until an order changes after it and returns the changed orders, in
+    any status, with the cursor to send next. Waiting clients share one
+    database poll and hold no worker thread; without ASGI the request
+    returns immediately, like a plain poll.
+    """
+    viewset_class = OrderViewSet
+
+    async def get(self, request):
+        cursor = request.GET.get('cursor')
+        if cursor is not None:
+            cursor = parse_datetime(cursor)
+            if cursor is None or timezone.is_naive(cursor):
+                return self.render({'error': 'Invalid cursor'}, 400)
+        try:
+            timeout = int(request.GET.get('timeout', ORDER_CHANGES_TIMEOUT))
+        except ValueError:
+            return self.render({'error': 'Invalid timeout'}, 400)
+        if not 0 <= timeout <= ORDER_CHANGES_MAX_TIMEOUT:
+            return self.render(
+                {'error': f'timeout must be between 0 and {ORDER_CHANGES_MAX_TIMEOUT}'}, 400
+            )
+        if not isinstance(request, ASGIRequest):
+            timeout = 0
+
+        values_serializer = OrderValuesSerializer()
+        if cursor is None:
+            open_statuses = [status for status, targets in ORDER_TRANSITIONS.items() if targets]
+            rows = [
+                row async for row in values_serializer.values(
+                    Order.objects.filter(status__in=open_statuses).order_by('updated_at', 'id')
+                )
+            ]
+            return self.render({
+                'cursor': await latest_order_change() or timezone.now(),
+                'results': values_serializer.to_representation(rows),
+            })
+
+        changed = Order.objects.filter(updated_at__gt=cursor).order_by('updated_at', 'id')
+        if timeout and not await changed.aexists():
+            await order_feed.wait(cursor, timeout)
+
+        recent = Order.objects.filter(
+            updated_at__gt=cursor - ORDER_CHANGES_OVERLAP,
+            updated_at__lte=cursor
+        ).order_by('updated_at', 'id')
+        rows = [row async for row in values_serializer.values(recent)]
+        rows += [row async for row in values_serializer.values(changed)[:ORDER_CHANGES_LIMIT]]
+        return self.render({
+            'cursor': max([cursor, *(row['updated_at'] for row in rows)]),
+            'results': values_serializer.to_representation(rows),
+        })
@@ -0,0 +1,33 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend for a web server with concurrent writers.
+
+    Besides the ``sqlite3.connect()`` arguments, OPTIONS accepts:
+
+    ``pragmas``
+        PRAGMA name -> value, applied to every new connection.
+    ``transaction_mode``
+        ``DEFERRED`` (SQLite's default), ``IMMEDIATE`` or ``EXCLUSIVE``.
+        A deferred transaction that reads before it writes cannot upgrade
+        its lock while another connection writes, and fails at once with
+        "database is locked" instead of waiting; IMMEDIATE takes the write
+        lock up front, so writers queue on the busy timeout instead.
+    """
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
@@ -0,0 +1,442 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Supplier,
+    Ingredient,
+    MenuItem,
+    RecipeItem,
+    Order,
+    StockMovement,
+    SupplierCategory,
+    IngredientUnit,
+    StorageType,
+    MenuItemCategory,
+    OrderStatus,
+    StockMovementReason
+)
+from .sales import rebuild_sales_rollup
+from .search import rebuild_search_index
+
+BATCH_SIZE = 5000
+
+# Sync endpoints and their async counterparts (see inventory.async_views)
+ASYNC_ROUTES = [
+    ('/api/suppliers/', '/api/async/suppliers/'),
+    ('/api/ingredients/', '/api/async/ingredients/'),
+    ('/api/menu-items/', '/api/async/menu-items/'),
+    ('/api/orders/pending_orders/', '/api/async/orders/pending/'),
+]
+
+# Request bodies / query parameters for custom actions, keyed by action name.
+# Each factory receives the sample objects chosen for the run.
+ACTION_REQUESTS = {
+    'adjust_stock': lambda samples: {'data': {'quantity': 1}},
+    # Re-sending the current status is valid from any state, so repeated
+    # runs do not fail on the order state machine
+    'update_status': lambda samples: {'data': {'status': samples[Order][1].status}},
+    'bulk_adjust': lambda samples: {
+        'data': [{'ingredient': str(ingredient.pk), 'delta': 1} for ingredient in samples[Ingredient]]
+    },
+    'receive': lambda samples: {'data': {'quantity': 1}},
+    'stock_at': lambda samples: {
+        'params': {'at': (timezone.now() - timedelta(days=1)).isoformat()}
+    },
+    'batch': lambda samples: {
+        'data': [{'menu_item': str(samples[MenuItem][0].pk), 'quantity': 1}] * 10
+    },
+}
+
+
+def seed(suppliers=50, ingredients=1000, menu_items=200, recipe_size=8,
+         orders=100000, days=365, random_seed=0):
+    """
+    Fill the current database with synthetic data in bulk.
+
+    Orders are spread evenly over the last ``days`` days and bypass
+    Order.save, so stock levels are left high enough for the benchmark
+    itself to place orders.
+    """
+    rng = random.Random(random_seed)
+
+    Supplier.objects.bulk_create(
+        (
+            Supplier(
+                name=f"Supplier {index}",
+                category=rng.choice(SupplierCategory.values),
+                contact_person=f"Contact {index}",
+                email=f"supplier{index}@example.com",
+                phone_number=f"555-{index:04d}",
+                address=f"{index} Market Street",
+                rating=round(rng.uniform(1, 5), 2)
+            )
+            for index in range(suppliers)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    supplier_ids = list(Supplier.objects.values_list('pk', flat=True))
+
+    today = timezone.now().date()
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(
+                name=f"Ingredient {index}",
+                supplier_id=rng.choice(supplier_ids),
+                stock_quantity=rng.randint(10000, 1000000),
+                unit=rng.choice(IngredientUnit.values),
+                minimum_stock_level=rng.randint(0, 20000),
+                cost_per_unit=round(rng.uniform(0.01, 20), 2),
+                storage_type=rng.choice(StorageType.values),
+                expiry_date=today + timedelta(days=rng.randint(-10, 120))
+            )
+            for index in range(ingredients)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(ingredient_id=pk, delta=stock, reason=StockMovementReason.INITIAL)
+            for pk, stock in Ingredient.objects.values_list('pk', 'stock_quantity').iterator()
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    MenuItem.objects.bulk_create(
+        (
+            MenuItem(
+                name=f"Menu Item {index}",
+                category=rng.choice(MenuItemCategory.values),
+                is_vegetarian=rng.random() < 0.3,
+                price=round(rng.uniform(3, 40), 2),
+                preparation_time_minutes=rng.randint(1, 60)
+            )
+            for index in range(menu_items)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    menu_item_ids = list(MenuItem.objects.values_list('pk', flat=True))
+
+    RecipeItem.objects.bulk_create(
+        (
+            RecipeItem(
+                menu_item_id=menu_item_id,
+                ingredient_id=ingredient_id,
+                quantity=round(rng.uniform(0.01, 2), 2)
+            )
+            for menu_item_id in menu_item_ids
+            for ingredient_id in rng.sample(ingredient_ids, min(recipe_size, len(ingredient_ids)))
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    # bulk_create sends no signals
+    MenuItem.objects.refresh_servable_portions()
+
+    now = timezone.now()
+    batches = max(1, -(-orders // BATCH_SIZE))
+    for batch in range(batches):
+        created = Order.objects.bulk_create(
+            Order(
+                menu_item_id=rng.choice(menu_item_ids),
+                quantity=rng.randint(1, 4),
+                customer_name=f"Guest {rng.randint(1, 5000)}",
+                status=rng.choice(OrderStatus.values)
+            )
+            for _ in range(min(BATCH_SIZE, orders - batch * BATCH_SIZE))
+        )
+        # order_date is auto_now_add, so backdate each batch afterwards
+        Order.objects.filter(pk__in=[order.pk for order in created]).update(
+            order_date=now - timedelta(days=days * batch / batches)
+        )
+
+    rebuild_sales_rollup()
+    rebuild_search_index()
+
+
+def _samples(models):
+    """
+    Up to two objects per model: the first is referenced by request bodies,
+    the second is the target of detail routes and mutating actions
+    """
+    samples = {}
+    for model in models:
+        objects = list(model.objects.order_by('pk')[:2])
+        samples[model] = objects + objects[:1] * (2 - len(objects))
+    return samples
+
+
+def endpoint_requests(router, prefix='/api/'):
+    """
+    One request description per route of ``router``: list, retrieve, order
+    creation and every custom action. Detail routes are skipped for models
+    without rows.
+    """
+    samples = _samples({MenuItem} | {viewset.queryset.model for _, viewset, _ in router.registry})
+    requests = []
+    for url_prefix, viewset, _ in router.registry:
+        objects = samples[viewset.queryset.model]
+        target = objects[1] if objects else None
+        base = f"{prefix}{url_prefix}/"
+        requests.append({'name': f"{viewset.__name__}.list", 'method': 'GET', 'path': base})
+        if target is not None:
+            requests.append({
+                'name': f"{viewset.__name__}.retrieve",
+                'method': 'GET',
+                'path': f"{base}{target.pk}/"
+            })
+        if viewset.queryset.model is Order:
+            requests.append({
+                'name': f"{viewset.__name__}.create",
+                'method': 'POST',
+                'path': base,
+                'data': {'menu_item': str(samples[MenuItem][0].pk), 'quantity': 1},
+            })
+
+        for extra in viewset.get_extra_actions():
+            if extra.detail and target is None:
+                continue
+            path = f"{base}{target.pk}/{extra.url_path}/" if extra.detail else f"{base}{extra.url_path}/"
+            request = ACTION_REQUESTS.get(extra.__name__, lambda samples: {})(samples)
+            for method in extra.mapping:
+                requests.append({
+                    'name': f"{viewset.__name__}.{extra.__name__}",
+                    'method': method.upper(),
+                    'path': path,
+                    **request,
+                })
+    return requests
+
+
+def _send(client, request):
+    if request['method'] == 'GET':
+        response = client.get(request['path'], request.get('params'))
+    else:
+        response = client.generic(
+            request['method'],
+            request['path'],
+            json.dumps(request.get('data', {})),
+            content_type='application/json'
+        )
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def percentile(sorted_values, percent):
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+def run(requests, iterations=50):
+    """
+    Drive every request ``iterations`` times and report latency, throughput,
+    SQL query counts and peak memory per endpoint
+    """
+    client = Client()
+    results = {}
+    for request in requests:
+        key = f"{request['method']} {request['name']}"
+
+        # Instrumented probe: query count and allocation peak of one request.
+        # The query log is bounded, so empty it for an exact count.
+        connection.queries_log.clear()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            _send(client, request)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        query_count = len(queries)
+
+        durations = []
+        errors = 0
+        started = time.perf_counter_ns()
+        for _ in range(iterations):
+            request_started = time.perf_counter_ns()
+            response = _send(client, request)
+            durations.append(time.perf_counter_ns() - request_started)
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter_ns() - started
+
+        durations.sort()
+        results[key] = {
+            'path': request['path'],
+            'requests': iterations,
+            'errors': errors,
+            'throughput_rps': round(iterations / (elapsed / 1e9), 2),
+            'p50_ms': round(percentile(durations, 50) / 1e6, 3),
+            'p95_ms': round(percentile(durations, 95) / 1e6, 3),
+            'p99_ms': round(percentile(durations, 99) / 1e6, 3),
+            'queries': query_count,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    List regressions against a baseline report: p95 latency more than
+    ``tolerance`` slower, more SQL queries, or new errors
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{key}: queries {previous['queries']} -> {current['queries']}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{key}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def _load_summary(durations, errors, elapsed_ns):
+    durations.sort()
+    return {
+        'requests': len(durations),
+        'errors': errors,
+        'throughput_rps': round(len(durations) / (elapsed_ns / 1e9), 2),
+        'p50_ms': round(percentile(durations, 50) / 1e6, 3),
+        'p95_ms': round(percentile(durations, 95) / 1e6, 3),
+        'p99_ms': round(percentile(durations, 99) / 1e6, 3),
+    }
+
+
+def _sync_load(path, concurrency, total):
+    local = threading.local()
+    durations = []
+    errors = []
+
+    def send(_):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        started = time.perf_counter_ns()
+        response = client.get(path)
+        durations.append(time.perf_counter_ns() - started)
+        errors.append(response.status_code >= 400)
+
+    started = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(total)))
+    return _load_summary(durations, sum(errors), time.perf_counter_ns() - started)
+
+
+async def _async_load(path, concurrency, total):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+    errors = []
+
+    async def send():
+        async with semaphore:
+            started = time.perf_counter_ns()
+            response = await client.get(path)
+            durations.append(time.perf_counter_ns() - started)
+            errors.append(response.status_code >= 400)
+
+    started = time.perf_counter_ns()
+    await asyncio.gather(*(send() for _ in range(total)))
+    return _load_summary(durations, sum(errors), time.perf_counter_ns() - started)
+
+
+def compare_async(concurrency=32, total=200):
+    """
+    Load each read endpoint through the sync stack (one thread per
+    concurrent request) and through its async counterpart (one event loop)
+    """
+    return {
+        sync_path: {
+            'sync': _sync_load(sync_path, concurrency, total),
+            'async': async_to_sync(_async_load)(async_path, concurrency, total),
+        }
+        for sync_path, async_path in ASYNC_ROUTES
+    }
+
+
+# Stock SQLite behaviour (rollback journal, deferred transactions, the
+# 5 second sqlite3 timeout), for comparison with the configured profile
+SQLITE_BASELINE_OPTIONS = {'pragmas': {'journal_mode': 'DELETE'}}
+
+
+def concurrent_orders(concurrency=16, total=800, label='concurrency'):
+    """
+    Place ``total`` orders through the API from ``concurrency`` threads,
+    each on its own database connection, all drawing on the same
+    ingredient row. Failed requests are mostly lock errors.
+    """
+    supplier = Supplier.objects.create(
+        name=f"Supplier {label}",
+        email=f"{label}@example.com"
+    )
+    ingredient = Ingredient.objects.create(
+        name=f"Ingredient {label}",
+        supplier=supplier,
+        stock_quantity=total,
+        cost_per_unit=1,
+        expiry_date=timezone.now().date() + timedelta(days=30)
+    )
+    menu_item = MenuItem.objects.create(
+        name=f"Menu Item {label}",
+        price=10,
+        preparation_time_minutes=5
+    )
+    RecipeItem.objects.create(menu_item=menu_item, ingredient=ingredient, quantity=1)
+    body = json.dumps({'menu_item': str(menu_item.pk), 'quantity': 1})
+    durations = []
+    errors = []
+
+    def place(count):
+        client = Client(raise_request_exception=False)
+        try:
+            for _ in range(count):
+                started = time.perf_counter_ns()
+                response = client.post('/api/orders/', body, content_type='application/json')
+                durations.append(time.perf_counter_ns() - started)
+                errors.append(response.status_code >= 400)
+        finally:
+            connection.close()
+
+    counts = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+    started = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(place, counts))
+    return _load_summary(durations, sum(errors), time.perf_counter_ns() - started)
+
+
+def compare_database_profiles(concurrency=16, total=800):
+    """
+    Concurrent order placement under the configured database profile and,
+    on SQLite, under stock SQLite settings
+    """
+    results = {}
+    if connection.vendor == 'sqlite':
+        options = connection.settings_dict['OPTIONS']
+        configured = dict(options)
+        # Every thread's connection shares this settings dict
+        connection.close()
+        options.clear()
+        options.update(SQLITE_BASELINE_OPTIONS)
+        try:
+            results['baseline'] = concurrent_orders(concurrency, total, 'baseline')
+        finally:
+            connection.close()
+            options.clear()
+            options.update(configured)
+    results['configured'] = concurrent_orders(concurrency, total, 'configured')
+    return results
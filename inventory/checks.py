@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local(alias):
+    """
+    True when the cache ``alias`` is private to each worker process
+    """
+    return settings.CACHES.get(alias, {}).get('BACKEND') in LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches)
+def check_version_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'MODEL_VERSION_CACHE_ALIAS', 'default')
+    if not is_process_local(alias):
+        return []
+    return [
+        Warning(
+            f"MODEL_VERSION_CACHE_ALIAS '{alias}' is a per-process cache.",
+            hint=(
+                "With more than one worker each process keeps its own model "
+                "versions, so ETags and cached responses outlive writes made "
+                "by other workers. Use a shared cache such as 'versions'."
+            ),
+            id='inventory.W001',
+        )
+    ]
+
+
+@register(Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    response_alias = getattr(settings, 'RESPONSE_CACHE_ALIAS', None)
+    version_alias = getattr(settings, 'MODEL_VERSION_CACHE_ALIAS', 'default')
+    if not response_alias or is_process_local(response_alias) or not is_process_local(version_alias):
+        return []
+    return [
+        Error(
+            f"RESPONSE_CACHE_ALIAS '{response_alias}' is shared between workers but "
+            f"MODEL_VERSION_CACHE_ALIAS '{version_alias}' is a per-process cache.",
+            hint=(
+                "Cached responses are keyed by model versions; a worker that "
+                "never saw a write keeps serving the stale entry. Use a shared "
+                "cache for MODEL_VERSION_CACHE_ALIAS."
+            ),
+            id='inventory.E001',
+        )
+    ]
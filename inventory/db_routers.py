@@ -0,0 +1,87 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Alias reads go to for the current request; None means the primary
+_read_alias = ContextVar('inventory_read_alias', default=None)
+
+# Cookie holding the time until which a client that wrote reads from the
+# primary
+PRIMARY_COOKIE = 'read_primary_until'
+
+
+def replica_alias():
+    """
+    READ_REPLICA_ALIAS, or None when no replica is configured
+    """
+    return getattr(settings, 'READ_REPLICA_ALIAS', None)
+
+
+def replica_lag():
+    """
+    Seconds the replica is assumed to trail the primary by at most
+    """
+    return getattr(settings, 'READ_REPLICA_LAG', 5)
+
+
+def read_alias():
+    return _read_alias.get()
+
+
+def use_replica(alias):
+    """
+    Route this request's reads to ``alias`` (None: the primary). Returns a
+    token for ``reset_replica``.
+    """
+    return _read_alias.set(alias)
+
+
+def reset_replica(token):
+    _read_alias.reset(token)
+
+
+def replica_may_be_stale(versions):
+    """
+    True when this request reads from the replica and any of the model
+    change ``versions`` (see inventory.versions) is newer than the replica
+    lag, so the replica may not have that change yet
+    """
+    if _read_alias.get() is None or not versions:
+        return False
+    return max(versions) > time.time_ns() - replica_lag() * 10**9
+
+
+def primary_for_recent_changes(versions):
+    """
+    Move this request's reads back to the primary when the replica may be
+    stale for ``versions``. Only for responses that are kept under those
+    versions (the response cache): other reads stay on the replica, which
+    matters most while orders keep the versions fresh.
+    """
+    if replica_may_be_stale(versions):
+        _read_alias.set(None)
+
+
+class ReplicaRouter:
+    """
+    Reads go to the alias chosen for the current request by
+    ReplicaRoutingMiddleware, writes always go to the primary. The
+    replica is never migrated; it copies the primary's schema.
+    """
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Without an answer Django would write objects read from the
+        # replica back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,54 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+    File-like object that hands each written line straight back, so
+    csv.writer can be used to produce a stream
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_response(queryset, fields, export_format, filename):
+    """
+    Stream ``queryset`` as CSV or NDJSON without loading it into memory.
+
+    ``fields`` is a list of ``(column, lookup)`` pairs; rows are read with
+    ``values_list`` in chunks of EXPORT_CHUNK_SIZE.
+    """
+    columns = [column for column, _ in fields]
+    rows = queryset.values_list(
+        *[lookup for _, lookup in fields]
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    
+    lines = _csv_lines if export_format == 'csv' else _ndjson_lines
+    response = StreamingHttpResponse(
+        lines(columns, rows), 
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
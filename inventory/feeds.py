@@ -0,0 +1,65 @@
+import asyncio
+import weakref
+
+
+class _LoopFeed:
+    """
+    Waiters and the poll task of a ChangeFeed on one event loop; asyncio
+    conditions and tasks cannot be shared between loops
+    """
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.marker = None
+        self.subscribers = 0
+        self.task = None
+
+
+class ChangeFeed:
+    """
+    Shares one database poll for a change marker (the newest alert id,
+    the latest order update, ...) between every waiting client in this
+    process. Clients sleep until the marker moves past what they have
+    already seen instead of querying on their own.
+
+    ``latest`` is an async callable returning the current marker, or None
+    while there is nothing to report. Each running event loop gets its own
+    poll, so the module-level feeds keep working when a loop is replaced
+    (a server reload, async_to_sync outside ASGI, tests).
+    """
+    def __init__(self, latest, poll_interval=1.0):
+        self.latest = latest
+        self.poll_interval = poll_interval
+        self._loops = weakref.WeakKeyDictionary()
+
+    async def _poll(self, state):
+        while state.subscribers:
+            marker = await self.latest()
+            if marker is not None and marker != state.marker:
+                async with state.condition:
+                    state.marker = marker
+                    state.condition.notify_all()
+            await asyncio.sleep(self.poll_interval)
+        state.task = None
+
+    async def wait(self, after, timeout):
+        """
+        Wait up to ``timeout`` seconds for the marker to move past ``after``
+        """
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopFeed()
+        state.subscribers += 1
+        try:
+            if state.task is None:
+                state.task = loop.create_task(self._poll(state))
+            async with state.condition:
+                await asyncio.wait_for(
+                    state.condition.wait_for(lambda: state.marker is not None and state.marker > after),
+                    timeout
+                )
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            state.subscribers -= 1
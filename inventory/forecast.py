@@ -0,0 +1,157 @@
+from datetime import datetime, time, timedelta
+from decimal import ROUND_CEILING, Decimal
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Ingredient, Order, OrderStatus, RecipeItem
+
+CENT = Decimal('0.01')
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def daily_consumption(ingredient_ids, start, end):
+    """
+    Ingredient consumption per day from ``start`` up to (not including)
+    ``end``, as a ``days x ingredients`` array in ``ingredient_ids`` order.
+
+    Orders are summed per day and menu item in SQL and exploded through
+    the recipes with a single matrix product. Cancelled orders are left
+    out.
+    """
+    days = (end - start).days
+    columns = {pk: index for index, pk in enumerate(ingredient_ids)}
+
+    recipe_rows = list(
+        RecipeItem.objects
+        .filter(ingredient_id__in=ingredient_ids)
+        .values_list('menu_item_id', 'ingredient_id', 'quantity')
+    )
+    rows = {pk: index for index, pk in enumerate({menu_item_id for menu_item_id, _, _ in recipe_rows})}
+    recipes = np.zeros((len(rows), len(columns)))
+    for menu_item_id, ingredient_id, quantity in recipe_rows:
+        recipes[rows[menu_item_id], columns[ingredient_id]] = quantity
+
+    sales = (
+        Order.objects
+        .filter(
+            menu_item_id__in=list(rows),
+            order_date__gte=_start_of_day(start),
+            order_date__lt=_start_of_day(end)
+        )
+        .exclude(status=OrderStatus.CANCELLED)
+        .annotate(day=TruncDate('order_date'))
+        .values('day', 'menu_item')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+        .values_list('day', 'menu_item', 'units')
+    )
+    units = np.zeros((days, len(rows)))
+    for day, menu_item_id, quantity in sales:
+        units[(day - start).days, rows[menu_item_id]] = quantity
+
+    return units @ recipes
+
+
+def forecast_consumption(history, start, days, half_life=28):
+    """
+    Forecast ``days`` of consumption after a ``days x ingredients``
+    ``history`` array whose first row is ``start``.
+
+    The daily level is an exponentially weighted mean (recent days count
+    more, halving every ``half_life`` days), shaped by each ingredient's
+    weekday profile once there are at least two weeks of history.
+    Returns a ``days x ingredients`` array.
+    """
+    history_days, ingredients = history.shape
+    if not history_days:
+        return np.zeros((days, ingredients))
+
+    age = np.arange(history_days - 1, -1, -1)
+    weights = 0.5 ** (age / half_life)
+    level = weights @ history / weights.sum()
+
+    weekdays = (start.weekday() + np.arange(history_days)) % 7
+    profile = np.ones((7, ingredients))
+    if history_days >= 14:
+        mean = history.mean(axis=0)
+        for weekday in range(7):
+            weekday_mean = history[weekdays == weekday].mean(axis=0)
+            np.divide(weekday_mean, mean, out=profile[weekday], where=mean > 0)
+
+    future_weekdays = (start.weekday() + history_days + np.arange(days)) % 7
+    return level * profile[future_weekdays]
+
+
+def reorder_plan(ingredients=None, days=14, history_days=90, half_life=28):
+    """
+    Suggested purchases per supplier to cover the next ``days`` days.
+
+    Each ingredient needs its forecast consumption plus its minimum stock
+    level on hand; whatever the current stock falls short of that is
+    suggested, priced at ``cost_per_unit``. Ingredients that need nothing
+    are left out.
+    """
+    if ingredients is None:
+        ingredients = Ingredient.objects.all()
+    ingredients = list(ingredients.values(
+        'id', 'name', 'unit', 'stock_quantity', 'minimum_stock_level', 'cost_per_unit',
+        'supplier', 'supplier__name', 'supplier__email'
+    ))
+    today = timezone.localdate()
+    start = today - timedelta(days=history_days)
+
+    ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+    forecast = forecast_consumption(
+        daily_consumption(ingredient_ids, start, today), start, days, half_life
+    )
+    stock = np.array([float(ingredient['stock_quantity']) for ingredient in ingredients])
+    minimum = np.array([float(ingredient['minimum_stock_level']) for ingredient in ingredients])
+
+    demand = forecast.sum(axis=0)
+    shortfall = np.maximum(demand + minimum - stock, 0)
+    # First forecast day on which cumulative consumption exceeds the stock
+    runs_out = forecast.cumsum(axis=0) > stock
+    stockout = np.where(runs_out.any(axis=0), runs_out.argmax(axis=0) + 1, -1)
+
+    suppliers = {}
+    for index, ingredient in enumerate(ingredients):
+        if shortfall[index] <= 0:
+            continue
+        quantity = Decimal(str(shortfall[index])).quantize(CENT, rounding=ROUND_CEILING)
+        cost = (quantity * ingredient['cost_per_unit']).quantize(CENT)
+        supplier = suppliers.setdefault(ingredient['supplier'], {
+            'supplier': ingredient['supplier'],
+            'supplier_name': ingredient['supplier__name'],
+            'email': ingredient['supplier__email'],
+            'estimated_cost': Decimal(0),
+            'items': [],
+        })
+        supplier['estimated_cost'] += cost
+        supplier['items'].append({
+            'ingredient': ingredient['id'],
+            'name': ingredient['name'],
+            'unit': ingredient['unit'],
+            'stock_quantity': ingredient['stock_quantity'],
+            'minimum_stock_level': ingredient['minimum_stock_level'],
+            'forecast_quantity': Decimal(str(demand[index])).quantize(CENT),
+            'suggested_quantity': quantity,
+            'estimated_cost': cost,
+            'days_until_stockout': int(stockout[index]) if stockout[index] > 0 else None,
+        })
+
+    plan = sorted(suppliers.values(), key=lambda supplier: supplier['supplier_name'])
+    for supplier in plan:
+        supplier['items'].sort(key=lambda item: item['name'])
+    return {
+        'start': today,
+        'days': days,
+        'history_days': history_days,
+        'estimated_cost': sum((supplier['estimated_cost'] for supplier in plan), Decimal(0)),
+        'suppliers': plan,
+    }
@@ -0,0 +1,128 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from inventory import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database with synthetic data, drive every API "
+        "endpoint and report latency, throughput, query counts and memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suppliers', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--menu-items', type=int, default=200)
+        parser.add_argument('--recipe-size', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help="Requests per endpoint")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--baseline', help="Compare against this JSON report")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Write the report to --baseline instead of comparing")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 slowdown against the baseline")
+        parser.add_argument('--compare-async', action='store_true',
+                            help="Also load the sync and async read endpoints concurrently")
+        parser.add_argument('--concurrent-orders', action='store_true',
+                            help="Also place orders from concurrent threads under the "
+                                 "configured database profile (and stock settings on SQLite)")
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help="Concurrent requests for --compare-async and --concurrent-orders")
+
+    def handle(self, *args, **options):
+        from restaurant_inventory.urls import router
+
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError("--save-baseline requires --baseline")
+
+        # Run against a fresh test database so real data is never touched
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        temp_dir = None
+        if options['concurrent_orders'] and connection.vendor == 'sqlite':
+            # Threads need a file database; in-memory SQLite has no WAL
+            # and locks whole tables
+            temp_dir = tempfile.TemporaryDirectory()
+            connection.settings_dict['TEST']['NAME'] = str(Path(temp_dir.name) / 'bench.sqlite3')
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        except Exception:
+            if temp_dir is not None:
+                temp_dir.cleanup()
+            raise
+        # Replica reads must hit the throwaway database too
+        for alias in connections:
+            if alias != DEFAULT_DB_ALIAS:
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            self.stderr.write("Seeding data...")
+            bench.seed(
+                suppliers=options['suppliers'],
+                ingredients=options['ingredients'],
+                menu_items=options['menu_items'],
+                recipe_size=options['recipe_size'],
+                orders=options['orders'],
+                days=options['days'],
+            )
+            self.stderr.write("Running requests...")
+            results = bench.run(bench.endpoint_requests(router), options['iterations'])
+            async_comparison = None
+            if options['compare_async']:
+                self.stderr.write("Comparing sync and async read paths...")
+                async_comparison = bench.compare_async(
+                    options['concurrency'], 
+                    options['iterations'] * options['concurrency']
+                )
+            database_comparison = None
+            if options['concurrent_orders']:
+                self.stderr.write("Placing orders concurrently...")
+                database_comparison = bench.compare_database_profiles(
+                    options['concurrency'],
+                    options['iterations'] * options['concurrency']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if temp_dir is not None:
+                # Also removes the -wal and -shm files next to the database
+                temp_dir.cleanup()
+
+        report = {
+            'config': {
+                key: options[key]
+                for key in ('suppliers', 'ingredients', 'menu_items', 'recipe_size',
+                            'orders', 'days', 'iterations')
+            },
+            'endpoints': results,
+        }
+        if async_comparison is not None:
+            report['async_comparison'] = async_comparison
+        if database_comparison is not None:
+            report['concurrent_orders'] = database_comparison
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+        self.stdout.write(output)
+
+        if not options['baseline']:
+            return
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(output)
+            self.stderr.write(f"Baseline written to {baseline_path}")
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        regressions = bench.compare(results, baseline['endpoints'], options['tolerance'])
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stderr.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.alerts import record_expired
+
+
+class Command(BaseCommand):
+    help = "Raise stock alerts for ingredients that have passed their expiry date"
+
+    def handle(self, *args, **options):
+        alerts = record_expired()
+        self.stdout.write(self.style.SUCCESS(f"Created {len(alerts)} expiry alerts"))
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from inventory.forecast import reorder_plan
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast ingredient consumption from the order history and print "
+        "suggested purchases grouped by supplier"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14,
+                            help="Days of consumption to cover")
+        parser.add_argument('--history-days', type=int, default=90,
+                            help="Days of order history to forecast from")
+        parser.add_argument('--half-life', type=float, default=28,
+                            help="Days after which a day of history counts half as much")
+        parser.add_argument('--json', action='store_true',
+                            help="Print the plan as JSON")
+
+    def handle(self, *args, **options):
+        plan = reorder_plan(
+            days=options['days'],
+            history_days=options['history_days'],
+            half_life=options['half_life'],
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(plan, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        for supplier in plan['suppliers']:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{supplier['supplier_name']} <{supplier['email']}>: {supplier['estimated_cost']}"
+            ))
+            for item in supplier['items']:
+                self.stdout.write(
+                    f"  {item['name']}: {item['suggested_quantity']} {item['unit']} "
+                    f"(forecast {item['forecast_quantity']}, stock {item['stock_quantity']}) "
+                    f"= {item['estimated_cost']}"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Estimated total for {plan['days']} days: {plan['estimated_cost']}"
+        ))
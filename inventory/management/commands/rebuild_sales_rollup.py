@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.sales import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollup from the order history"
+
+    def handle(self, *args, **options):
+        count = rebuild_sales_rollup()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} sales rollup rows"))
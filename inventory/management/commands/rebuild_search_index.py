@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-index suppliers, ingredients, menu items and orders for full-text "
+        "search, e.g. after rows were written without signals"
+    )
+
+    def handle(self, *args, **options):
+        models = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the search index of {models} models"))
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.permissions import SAFE_METHODS
+
+from inventory.replay import load_capture, replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a JSONL request capture (see REQUEST_CAPTURE_FILE) and report "
+        "latency distributions and error rates per endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture_file')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Number of worker threads")
+        parser.add_argument('--speedup', type=float, default=1.0,
+                            help="Divide the captured request spacing by this factor; 0 sends as fast as possible")
+        parser.add_argument('--url',
+                            help="Base URL of a running server; defaults to the in-process app")
+        parser.add_argument('--host', default='localhost',
+                            help="Host header for in-process requests")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--reads-only', action='store_true',
+                            help="Skip captured requests that are not GET/HEAD/OPTIONS")
+        parser.add_argument('--allow-writes', action='store_true',
+                            help="Replay POST/PUT/PATCH/DELETE requests in-process, "
+                                 "against the configured database")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['speedup'] < 0:
+            raise CommandError("--concurrency must be at least 1 and --speedup not negative")
+
+        try:
+            entries = load_capture(options['capture_file'])
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Could not read capture: {exc}")
+
+        if options['reads_only']:
+            entries = [entry for entry in entries if entry['method'] in SAFE_METHODS]
+        elif not options['url'] and not options['allow_writes']:
+            # In-process requests use this settings module's database
+            writes = sum(1 for entry in entries if entry['method'] not in SAFE_METHODS)
+            if writes:
+                raise CommandError(
+                    f"The capture has {writes} write requests, which would change the "
+                    f"configured database. Pass --reads-only to skip them, --url to send "
+                    f"them to a running server, or --allow-writes."
+                )
+
+        report = replay(
+            entries,
+            concurrency=options['concurrency'],
+            speedup=options['speedup'],
+            base_url=options['url'],
+            host=options['host'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output)
+        self.stdout.write(output)
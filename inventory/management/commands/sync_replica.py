@@ -0,0 +1,42 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from inventory.db_routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the replica file "
+        "(DB_REPLICA_NAME), standing in for replication in local setups"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep copying every INTERVAL seconds to simulate replication lag")
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No read replica configured (set DB_REPLICA_NAME)")
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("sync_replica only copies SQLite databases")
+        replica_name = connections[alias].settings_dict['NAME']
+        if str(replica_name) == str(primary.settings_dict['NAME']):
+            raise CommandError("The replica is the primary database file")
+
+        while True:
+            primary.ensure_connection()
+            target = sqlite3.connect(replica_name)
+            try:
+                # Online backup: a consistent copy while the primary is in use
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f"Copied the primary database to {replica_name}"))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Checkpoint the stock of every ingredient from the stock ledger; run "
+        "periodically (e.g. hourly) to bound point-in-time stock queries"
+    )
+
+    def handle(self, *args, **options):
+        snapshots = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Took {len(snapshots)} stock snapshots"))
@@ -0,0 +1,257 @@
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# Latency histogram bucket bounds in seconds (Prometheus defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+def route_name(request):
+    """
+    Stable label for the view that served ``request``.
+
+    DRF viewsets are labelled ``<ViewSet>.<action>`` (e.g.
+    ``OrderViewSet.retrieve``) so object ids never end up in label values.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = match.func
+    viewset = getattr(view, 'cls', None)
+    if viewset is not None:
+        action = (getattr(view, 'actions', None) or {}).get(request.method.lower())
+        return f"{viewset.__name__}.{action}" if action else viewset.__name__
+    return match.view_name or match._func_path
+
+
+class MetricsRegistry:
+    """
+    Request counters, latency histograms, in-flight gauges and response
+    cache hit/miss counters.
+
+    Without a ``directory`` the metrics describe the current process only.
+    With one, each process periodically writes its snapshot to
+    ``metrics-<pid>.json`` in that directory and scrapes merge all files, so
+    every worker of a multi-process server is reported.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory=None, flush_interval=1.0):
+        self.buckets = tuple(buckets)
+        self._bounds_ns = [int(bound * 1e9) for bound in self.buckets]
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Held while writing the snapshot file; one writer at a time
+        self._flush_lock = threading.Lock()
+        self._requests = {}
+        self._durations = {}
+        self._in_flight = {}
+        self._cache = {}
+        self._last_flush = 0.0
+
+    def request_started(self, method):
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def request_finished(self, route, method, status_code, duration_ns):
+        bucket = len(self._bounds_ns)
+        for index, bound in enumerate(self._bounds_ns):
+            if duration_ns <= bound:
+                bucket = index
+                break
+
+        with self._lock:
+            self._in_flight[method] -= 1
+            key = (route, method, str(status_code))
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            # Per-bucket counts followed by the duration sum in nanoseconds
+            histogram = self._durations.setdefault(
+                (route, method), [0] * (len(self._bounds_ns) + 2)
+            )
+            histogram[bucket] += 1
+            histogram[-1] += duration_ns
+
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            # A flush already in progress covers this request too
+            self.flush(blocking=False)
+
+    def cache_lookup(self, route, hit):
+        with self._lock:
+            key = (route, 'hit' if hit else 'miss')
+            self._cache[key] = self._cache.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': [[*key, value] for key, value in self._requests.items()],
+                'durations': [[*key, list(value)] for key, value in self._durations.items()],
+                'in_flight': [[key, value] for key, value in self._in_flight.items()],
+                'cache': [[*key, value] for key, value in self._cache.items()],
+            }
+
+    def flush(self, blocking=True):
+        """
+        Atomically replace this process's snapshot file. Returns False when
+        nothing was written: another thread was flushing (``blocking``
+        False) or the write failed, which is logged and never raised.
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return False
+        temp_path = None
+        try:
+            self._last_flush = time.monotonic()
+            path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+            # A name of its own, outside the metrics-*.json pattern
+            fd, temp_path = tempfile.mkstemp(
+                prefix=f".metrics-{os.getpid()}-", suffix='.tmp', dir=self.directory
+            )
+            with os.fdopen(fd, 'w') as handle:
+                json.dump(self.snapshot(), handle)
+            os.replace(temp_path, path)
+            temp_path = None
+            return True
+        except OSError:
+            logger.exception("Could not write the metrics snapshot")
+            return False
+        finally:
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+            self._flush_lock.release()
+
+    def collect(self):
+        """
+        Merge the snapshots of every process into one
+        """
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        requests, durations, in_flight, cache = {}, {}, {}, {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as handle:
+                    snapshot = json.load(handle)
+                pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            except (OSError, ValueError):
+                continue
+
+            for *key, value in snapshot['requests']:
+                key = tuple(key)
+                requests[key] = requests.get(key, 0) + value
+            for *key, value in snapshot['durations']:
+                key = tuple(key)
+                merged = durations.get(key, [0] * len(value))
+                durations[key] = [a + b for a, b in zip(merged, value)]
+            for *key, value in snapshot.get('cache', []):
+                key = tuple(key)
+                cache[key] = cache.get(key, 0) + value
+            # Counters of exited workers still count, their gauges do not
+            if _process_alive(pid):
+                for method, value in snapshot['in_flight']:
+                    in_flight[method] = in_flight.get(method, 0) + value
+
+        return {
+            'requests': [[*key, value] for key, value in requests.items()],
+            'durations': [[*key, value] for key, value in durations.items()],
+            'in_flight': [[key, value] for key, value in in_flight.items()],
+            'cache': [[*key, value] for key, value in cache.items()],
+        }
+
+    def render(self):
+        """
+        Metrics in the Prometheus text exposition format
+        """
+        snapshot = self.collect()
+        lines = [
+            '# HELP http_requests_total Total HTTP requests by route, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        for route, method, status_code, value in sorted(snapshot['requests']):
+            labels = _labels(route=route, method=method, status=status_code)
+            lines.append(f"http_requests_total{{{labels}}} {value}")
+
+        lines += [
+            '# HELP http_request_duration_seconds HTTP request latency by route and method.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for route, method, histogram in sorted(snapshot['durations']):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), histogram[:-1]):
+                cumulative += count
+                labels = _labels(route=route, method=method, le=str(bound))
+                lines.append(f"http_request_duration_seconds_bucket{{{labels}}} {cumulative}")
+            labels = _labels(route=route, method=method)
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram[-1] / 1e9}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            '# HELP http_requests_in_flight HTTP requests currently being served.',
+            '# TYPE http_requests_in_flight gauge',
+        ]
+        for method, value in sorted(snapshot['in_flight']):
+            lines.append(f"http_requests_in_flight{{{_labels(method=method)}}} {value}")
+
+        lines += [
+            '# HELP http_response_cache_total Response cache lookups by route and result.',
+            '# TYPE http_response_cache_total counter',
+        ]
+        for route, result, value in sorted(snapshot['cache']):
+            labels = _labels(route=route, result=result)
+            lines.append(f"http_response_cache_total{{{labels}}} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Process-wide registry configured from METRICS_MULTIPROCESS_DIR and
+    METRICS_BUCKETS
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(
+                    buckets=getattr(settings, 'METRICS_BUCKETS', DEFAULT_BUCKETS),
+                    directory=getattr(settings, 'METRICS_MULTIPROCESS_DIR', None),
+                )
+    return _registry
+
+
+def metrics_view(request):
+    return HttpResponse(
+        get_registry().render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,26 +1,166 @@
 import logging
 import time
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import (
+    PRIMARY_COOKIE,
+    replica_alias,
+    replica_lag,
+    reset_replica,
+    use_replica
+)
+from .metrics import get_registry, route_name
+from .replay import CAPTURE_PATH_PREFIXES, RequestCapture
+
 logger = logging.getLogger(__name__)
 
 class RequestLogMiddleware:
+    """
+    Records request metrics, the optional replay capture and a log line.
+
+    Works under WSGI and ASGI alike so Django never wraps the chain in
+    sync_to_async, which would hold a thread for as long as an async view
+    (e.g. a long-poll) waits.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Optional JSONL capture of every request for 'manage.py replay'
+        capture_file = getattr(settings, 'REQUEST_CAPTURE_FILE', None)
+        self.capture = RequestCapture(
+            capture_file, getattr(settings, 'REQUEST_CAPTURE_PATHS', CAPTURE_PATH_PREFIXES)
+        ) if capture_file else None
 
     def __call__(self, request):
-        # Log request details
-        start_time = time.time()
-        
-        response = self.get_response(request)
-        
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.request_started(request)
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self.request_failed(request, state)
+            raise
+        return self.request_finished(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.request_started(request)
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            self.request_failed(request, state)
+            raise
+        return self.request_finished(request, response, state)
+
+    def request_started(self, request):
+        get_registry().request_started(request.method)
+        # The body has to be read before the view consumes the stream
+        body = request.body if self.capture and self.capture.wants(request) else b''
+        return body, time.time(), time.perf_counter_ns()
+
+    def request_failed(self, request, state):
+        duration_ns = time.perf_counter_ns() - state[2]
+        get_registry().request_finished(route_name(request), request.method, 500, duration_ns)
+
+    def request_finished(self, request, response, state):
+        body, started_at, start_time = state
         # Calculate request processing time
-        duration = time.time() - start_time
+        duration_ns = time.perf_counter_ns() - start_time
+        route = route_name(request)
+        get_registry().request_finished(route, request.method, response.status_code, duration_ns)
+        
+        if self.capture:
+            self.capture.record(request, body, response, started_at, duration_ns, route)
         
         logger.info(
             f"Method: {request.method}, "
             f"Path: {request.path}, "
             f"Status: {response.status_code}, "
-            f"Duration: {duration:.2f}s"
+            f"Duration: {duration_ns / 1e9:.4f}s"
         )
         
         return response
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the reads of GET/HEAD requests to the read replica when the
+    DRF viewset lists the action in ``replica_actions``.
+
+    A client that writes gets a cookie keeping its reads on the primary
+    for READ_REPLICA_LAG seconds, so it always sees its own changes.
+
+    The routing is chosen here rather than in ``process_view`` because
+    Django runs a sync ``process_view`` through sync_to_async on every
+    ASGI request; the context variable is set around the awaited chain.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if replica_alias() is None:
+            return self.get_response(request)
+
+        token = use_replica(self.read_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+        return self.remember_write(request, response)
+
+    async def __acall__(self, request):
+        if replica_alias() is None:
+            return await self.get_response(request)
+
+        token = use_replica(self.read_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replica(token)
+        return self.remember_write(request, response)
+
+    def read_alias(self, request):
+        """
+        The replica alias when the request is a replica read and the
+        client has not written recently, else None (the primary)
+        """
+        alias = replica_alias()
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        try:
+            view_func = resolve(request.path_info, getattr(request, 'urlconf', None)).func
+        except Resolver404:
+            return None
+        action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+        if action not in getattr(getattr(view_func, 'cls', None), 'replica_actions', ()):
+            return None
+        try:
+            primary_until = float(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            primary_until = 0
+        return alias if primary_until < time.time() else None
+
+    def remember_write(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            lag = replica_lag()
+            response.set_cookie(
+                PRIMARY_COOKIE, 
+                f"{time.time() + lag:.3f}", 
+                max_age=lag, 
+                httponly=True, 
+                samesite='Lax'
+            )
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_remove_menuitem_recipe_recipeitem_menuitem_recipe'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='expiry_date',
+            field=models.DateField(blank=True, default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='preparation_time_minutes',
+            field=models.PositiveIntegerField(blank=True, help_text='Estimated preparation time in minutes', null=True, validators=[django.core.validators.MaxValueValidator(120)]),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'order_date'], name='order_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['menu_item', 'order_date'], name='order_menu_item_date_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def fill_sales_rollup(apps, schema_editor):
+    # Completed orders so far, per day and menu item (as rebuild_sales_rollup)
+    Order = apps.get_model('inventory', 'Order')
+    SalesRollup = apps.get_model('inventory', 'SalesRollup')
+    totals = (
+        Order.objects
+        .filter(status='COMP')
+        .annotate(day=TruncDate('order_date'))
+        .values('day', 'menu_item')
+        .annotate(
+            units=models.Sum('quantity'),
+            total=models.Sum(models.ExpressionWrapper(
+                models.F('menu_item__price') * models.F('quantity'), 
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ))
+        )
+        .order_by()
+    )
+    SalesRollup.objects.bulk_create(
+        (
+            SalesRollup(
+                day=row['day'], 
+                menu_item_id=row['menu_item'], 
+                quantity=row['units'], 
+                revenue=row['total']
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='inventory.menuitem')),
+            ],
+            options={
+                'unique_together': {('day', 'menu_item')},
+            },
+        ),
+        migrations.RunPython(fill_sales_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:11
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Floor
+
+
+def compute_servable_portions(apps, schema_editor):
+    MenuItem = apps.get_model('inventory', 'MenuItem')
+    RecipeItem = apps.get_model('inventory', 'RecipeItem')
+    portions = (
+        RecipeItem.objects
+        .filter(menu_item=models.OuterRef('pk'), quantity__gt=0)
+        .values('menu_item')
+        .annotate(portions=Cast(models.Min(Floor(models.ExpressionWrapper(
+            models.F('ingredient__stock_quantity') / models.F('quantity') + 1e-9,
+            output_field=models.FloatField()
+        ))), models.IntegerField()))
+        .values('portions')
+    )
+    MenuItem.objects.update(servable_portions=models.Subquery(portions))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='servable_portions',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(compute_servable_portions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_menuitem_servable_portions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('LOW', 'Low Stock'), ('OK', 'Restocked'), ('EXP', 'Expired')], max_length=3)),
+                ('stock_quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('minimum_stock_level', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.ingredient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ingredient', 'kind'], name='stockalert_ingredient_kind_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def record_opening_stock(apps, schema_editor):
+    Ingredient = apps.get_model('inventory', 'Ingredient')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(ingredient_id=pk, delta=stock, reason='INIT')
+            for pk, stock in Ingredient.objects.values_list('pk', 'stock_quantity').iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stockalert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reason', models.CharField(choices=[('INIT', 'Initial Stock'), ('ORD', 'Order'), ('ADJ', 'Adjustment')], max_length=4)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.ingredient')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='inventory.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ingredient', 'created_at'], name='movement_ingredient_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('taken_at', models.DateTimeField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.ingredient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ingredient', 'taken_at'], name='snapshot_ingredient_time_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_stock, migrations.RunPython.noop),
+    ]
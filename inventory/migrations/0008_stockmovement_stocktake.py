@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('ORD', 'Order'), ('ADJ', 'Adjustment'), ('CNT', 'Stocktake')], max_length=4),
+        ),
+    ]
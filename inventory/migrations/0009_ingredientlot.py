@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:27
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stockmovement_stocktake'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('ORD', 'Order'), ('ADJ', 'Adjustment'), ('CNT', 'Stocktake'), ('RCV', 'Delivery Received')], max_length=4),
+        ),
+        migrations.CreateModel(
+            name='IngredientLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('received_quantity', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('received_date', models.DateField(default=django.utils.timezone.localdate)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='inventory.ingredient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expiry_date'], name='lot_expiry_idx'), models.Index(fields=['ingredient', 'expiry_date', 'received_date'], name='lot_ingredient_expiry_idx'), models.Index(fields=['ingredient', 'received_date'], name='lot_ingredient_received_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    Order = apps.get_model('inventory', 'Order')
+    Order.objects.update(updated_at=models.F('order_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_ingredientlot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+        ),
+    ]
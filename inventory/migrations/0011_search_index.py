@@ -0,0 +1,122 @@
+from django.db import migrations
+
+# Indexed lookups per model as of this migration (see
+# inventory.search.SEARCH_INDEXES); one text column per lookup
+SEARCH_INDEXES = {
+    'inventory.supplier': ['name', 'contact_person', 'email'],
+    'inventory.ingredient': ['name'],
+    'inventory.menuitem': ['name', 'description'],
+    'inventory.order': ['customer_name', 'menu_item__name'],
+}
+
+
+def create_sqlite_tables(cursor, table, key_type, columns, rows_sql, params):
+    # FTS5 over an external content table, kept in sync by triggers
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    cursor.execute(
+        f'CREATE TABLE {table}_search (rowid INTEGER PRIMARY KEY, '
+        f'object_id {key_type} NOT NULL UNIQUE, '
+        + ', '.join(f'{column} TEXT' for column in columns) + ')'
+    )
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE {table}_fts USING fts5({column_list}, "
+        f"content='{table}_search', content_rowid='rowid', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    cursor.execute(
+        f'CREATE TRIGGER {table}_search_ai AFTER INSERT ON {table}_search BEGIN '
+        f'INSERT INTO {table}_fts(rowid, {column_list}) VALUES (new.rowid, {new_values}); END'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER {table}_search_ad AFTER DELETE ON {table}_search BEGIN '
+        f"INSERT INTO {table}_fts({table}_fts, rowid, {column_list}) "
+        f"VALUES ('delete', old.rowid, {old_values}); END"
+    )
+    cursor.execute(
+        f'CREATE TRIGGER {table}_search_au AFTER UPDATE ON {table}_search BEGIN '
+        f"INSERT INTO {table}_fts({table}_fts, rowid, {column_list}) "
+        f"VALUES ('delete', old.rowid, {old_values}); "
+        f'INSERT INTO {table}_fts(rowid, {column_list}) VALUES (new.rowid, {new_values}); END'
+    )
+    cursor.execute(
+        f'INSERT INTO {table}_search (object_id, {column_list}) {rows_sql}', params
+    )
+
+
+def create_postgresql_tables(cursor, table, key_type, columns, rows_sql, params):
+    # tsvector documents ('simple' configuration) with a GIN index
+    cursor.execute(
+        f'CREATE TABLE {table}_search (object_id {key_type} PRIMARY KEY, document tsvector NOT NULL)'
+    )
+    cursor.execute(
+        f'CREATE INDEX {table}_search_document_idx ON {table}_search USING GIN (document)'
+    )
+    document = ', '.join(f's.{column}' for column in columns)
+    cursor.execute(
+        f'INSERT INTO {table}_search (object_id, document) '
+        f"SELECT s.object_id, to_tsvector('simple', concat_ws(' ', {document})) "
+        f'FROM ({rows_sql}) AS s(object_id, {", ".join(columns)})',
+        params
+    )
+
+
+CREATE_TABLES = {
+    'sqlite': create_sqlite_tables,
+    'postgresql': create_postgresql_tables,
+}
+
+
+def create_search_tables(apps, schema_editor):
+    """
+    Create the search tables of every indexed model and fill them from the
+    existing rows
+    """
+    connection = schema_editor.connection
+    create_tables = CREATE_TABLES.get(connection.vendor)
+    if create_tables is None:
+        return
+    with connection.cursor() as cursor:
+        for label, fields in SEARCH_INDEXES.items():
+            model = apps.get_model(label)
+            rows = (
+                model._base_manager.using(connection.alias)
+                .order_by()
+                .values_list('pk', *fields)
+            )
+            rows_sql, params = rows.query.sql_with_params()
+            create_tables(
+                cursor,
+                model._meta.db_table,
+                model._meta.pk.db_type(connection),
+                [field.replace('__', '_') for field in fields],
+                rows_sql,
+                params
+            )
+
+
+def drop_search_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in CREATE_TABLES:
+        return
+    with connection.cursor() as cursor:
+        for label in SEARCH_INDEXES:
+            table = apps.get_model(label)._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+            cursor.execute(f'DROP TABLE IF EXISTS {table}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_order_version'),
+    ]
+
+    operations = [
+        # Full-text index tables (FTS5 on SQLite, tsvector + GIN on
+        # PostgreSQL), filled from the existing rows. The definitions are
+        # frozen here; inventory.search only reads and writes the rows.
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
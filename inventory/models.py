@@ -1,11 +1,15 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Cast, Coalesce, Floor
 from django.utils.translation import gettext_lazy as _
+from decimal import Decimal
 import uuid
 import re
 from django.utils import timezone
 
+from .versions import bump_versions
+
 class SupplierCategory(models.TextChoices):
     PRODUCE = 'PROD', _('Produce')
     MEAT = 'MEAT', _('Meat')
@@ -62,6 +66,24 @@ class StorageType(models.TextChoices):
     DRY_STORAGE = 'DRY', _('Dry Storage')
     ROOM_TEMP = 'ROOM', _('Room Temperature')
 
+class IngredientQuerySet(models.QuerySet):
+    def with_status(self):
+        """
+        Annotate ``low_stock`` and ``expired`` with the same rules as
+        ``is_low_stock()`` and ``is_expired()``, evaluated in the database
+        """
+        return self.annotate(
+            low_stock=models.ExpressionWrapper(
+                models.Q(stock_quantity__lte=models.F('minimum_stock_level')),
+                output_field=models.BooleanField()
+            ),
+            expired=models.Case(
+                models.When(expiry_date__lt=timezone.now().date(), then=True),
+                default=False,
+                output_field=models.BooleanField()
+            )
+        )
+
 class Ingredient(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, unique=True)
@@ -107,6 +129,16 @@ class Ingredient(models.Model):
         default=None  # Optional default
     )
     
+    objects = IngredientQuerySet.as_manager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember stored values so stock alerts can detect threshold crossings
+        instance._loaded_stock_quantity = instance.__dict__.get('stock_quantity')
+        instance._loaded_expiry_date = instance.__dict__.get('expiry_date')
+        return instance
+    
     def is_low_stock(self):
         """
         Check if the ingredient stock is below minimum level
@@ -130,6 +162,89 @@ class MenuItemCategory(models.TextChoices):
     DESSERT = 'DESS', _('Dessert')
     BEVERAGE = 'BEV', _('Beverage')
 
+class MenuItemQuerySet(models.QuerySet):
+    def with_ingredient_stats(self):
+        """
+        Annotate each menu item with its ingredient cost and availability,
+        computed in the database instead of walking every recipe in Python
+        """
+        cost = models.Sum(
+            models.F('recipe_items__ingredient__cost_per_unit')
+            * Cast('recipe_items__quantity', models.DecimalField(max_digits=12, decimal_places=4)),
+            output_field=models.DecimalField(max_digits=14, decimal_places=4)
+        )
+        short_ingredient = RecipeItem.objects.filter(
+            menu_item=models.OuterRef('pk'),
+            quantity__gt=models.F('ingredient__stock_quantity')
+        )
+        return self.annotate(
+            ingredient_cost=Coalesce(cost, Decimal(0)),
+            ingredient_availability=~models.Exists(short_ingredient)
+        )
+    
+    def with_sales_stats(self, start, end):
+        """
+        Annotate each menu item with its completed sales between ``start``
+        and ``end`` (from the sales rollup) and their theoretical ingredient
+        cost at current prices, in a single aggregated query:
+        ``units``, ``revenue``, ``unit_cost``, ``ingredient_cost``,
+        ``margin`` and ``food_cost_percentage`` (None without revenue)
+        """
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        in_range = models.Q(sales_rollups__day__range=(start, end))
+        unit_cost = (
+            RecipeItem.objects
+            .filter(menu_item=models.OuterRef('pk'))
+            .values('menu_item')
+            .annotate(cost=models.Sum(
+                models.F('ingredient__cost_per_unit')
+                * Cast('quantity', models.DecimalField(max_digits=12, decimal_places=4)),
+                output_field=models.DecimalField(max_digits=14, decimal_places=4)
+            ))
+            .values('cost')
+        )
+        return self.annotate(
+            units=Coalesce(models.Sum('sales_rollups__quantity', filter=in_range), 0),
+            revenue=Coalesce(models.Sum('sales_rollups__revenue', filter=in_range), Decimal(0), output_field=money),
+            unit_cost=Coalesce(
+                models.Subquery(unit_cost),
+                Decimal(0),
+                output_field=models.DecimalField(max_digits=14, decimal_places=4)
+            ),
+        ).annotate(
+            ingredient_cost=models.ExpressionWrapper(models.F('units') * models.F('unit_cost'), output_field=money),
+        ).annotate(
+            margin=models.ExpressionWrapper(models.F('revenue') - models.F('ingredient_cost'), output_field=money),
+            food_cost_percentage=models.Case(
+                models.When(
+                    revenue__gt=0,
+                    then=models.F('ingredient_cost') * 100 / models.F('revenue')
+                ),
+                default=None,
+                output_field=models.DecimalField(max_digits=7, decimal_places=2)
+            ),
+        )
+    
+    def refresh_servable_portions(self):
+        """
+        Recompute ``servable_portions`` for the menu items in this queryset
+        with a single UPDATE
+        """
+        # The small epsilon keeps e.g. 0.3 / 0.1 from flooring to 2
+        portions_per_ingredient = Floor(models.ExpressionWrapper(
+            models.F('ingredient__stock_quantity') / models.F('quantity') + 1e-9,
+            output_field=models.FloatField()
+        ))
+        portions = (
+            RecipeItem.objects
+            .filter(menu_item=models.OuterRef('pk'), quantity__gt=0)
+            .values('menu_item')
+            .annotate(portions=Cast(models.Min(portions_per_ingredient), models.IntegerField()))
+            .values('portions')
+        )
+        bump_versions(MenuItem)
+        return self.update(servable_portions=models.Subquery(portions))
+
 class MenuItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, unique=True)
@@ -166,24 +281,44 @@ class MenuItem(models.Model):
         blank=True  # Allow blank in forms
     )
     
+    # Portions current stock can make: the minimum over the recipe of stock
+    # divided by required quantity. NULL while the recipe is empty. Kept up
+    # to date by inventory.signals and the stock deduction.
+    servable_portions = models.PositiveIntegerField(
+        null=True, 
+        blank=True, 
+        editable=False, 
+        db_index=True
+    )
+    
+    objects = MenuItemQuerySet.as_manager()
+    
     def calculate_ingredient_cost(self):
         total_cost = 0
         for recipe_item in self.recipe_items.all():
-            total_cost += recipe_item.ingredient.cost_per_unit * recipe_item.quantity
+            total_cost += recipe_item.ingredient.cost_per_unit * Decimal(str(recipe_item.quantity))
         return total_cost
     
-    def check_ingredient_availability(self):
+    def check_ingredient_availability(self, quantity=1):
         """
         Check if all required ingredients are available in sufficient quantity
         """
-        for recipe_item in self.recipe_items.all():
-            ingredient = recipe_item.ingredient
-            required_quantity = recipe_item.quantity
-            
-            # Check if ingredient stock is less than required quantity
-            if ingredient.stock_quantity < required_quantity:
-                return False
-        return True
+        # Read the stored column rather than this instance's copy, which may
+        # predate the latest stock change
+        servable_portions = (
+            MenuItem.objects
+            .filter(pk=self.pk)
+            .values_list('servable_portions', flat=True)
+            .first()
+        )
+        return servable_portions is None or servable_portions >= quantity
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored price so a change can be applied to the sales rollup
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
     
     def __str__(self):
         return f"{self.name} (${self.price:.2f})"
@@ -218,6 +353,20 @@ class OrderStatus(models.TextChoices):
     COMPLETED = 'COMP', _('Completed')
     CANCELLED = 'CANC', _('Cancelled')
 
+# Statuses an order may move to from each status
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PREPARING, OrderStatus.CANCELLED},
+    OrderStatus.PREPARING: {OrderStatus.READY, OrderStatus.CANCELLED},
+    OrderStatus.READY: {OrderStatus.COMPLETED, OrderStatus.PREPARING},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+class OrderConflict(Exception):
+    """
+    The order was changed by someone else since the version the caller saw
+    """
+
 class Order(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -240,40 +389,328 @@ class Order(models.Model):
         choices=OrderStatus.choices, 
         default=OrderStatus.PENDING
     )
+    # Incremented on every write, for optimistic concurrency control
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Cursor pagination of the order feed
+            models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+            # Changed-since scans of the long-poll change feed
+            models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+            # Status / menu item filters combined with date ordering
+            models.Index(fields=['status', 'order_date'], name='order_status_date_idx'),
+            models.Index(fields=['menu_item', 'order_date'], name='order_menu_item_date_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can detect transitions, and
+        # what the sales rollup counted for a completed order
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_sale = (
+            instance.__dict__.get('order_date'),
+            instance.__dict__.get('menu_item_id'),
+            instance.__dict__.get('quantity')
+        )
+        return instance
     
     def calculate_total_price(self):
         return self.menu_item.price * self.quantity
     
     def reduce_ingredient_stock(self):
-        if self.status == OrderStatus.COMPLETED:
-            for recipe_item in self.menu_item.recipe_items.all():
-                ingredient = recipe_item.ingredient
-                required_quantity = recipe_item.quantity
-                
-                ingredient.stock_quantity -= required_quantity * self.quantity
-                ingredient.save()
+        """
+        Deduct the ingredients for this order from stock in one statement
+        and record the movements in the stock ledger
+        """
+        from .stock import consume_stock
+
+        consume_stock([self])
     
     def save(self, *args, **kwargs):
-        # Validate ingredient availability before saving
-        menu_item = self.menu_item
+        from .sales import record_sale_edit, record_status_change
+
+        previous_status = getattr(self, '_loaded_status', None)
         
-        # Check if menu item is available
-        if not menu_item.is_available:
-            raise ValidationError("Menu item is not available")
+        # Stock is deducted when the order is placed; later saves only
+        # touch inventory when they change what was ordered
+        _, placed_menu_item_id, placed_quantity = getattr(self, '_loaded_sale', (None, None, None))
+        rebook = (
+            not self._state.adding
+            and None not in (placed_menu_item_id, placed_quantity)
+            and (placed_menu_item_id, placed_quantity) != (self.menu_item_id, self.quantity)
+        )
+        if self._state.adding or (rebook and placed_menu_item_id != self.menu_item_id):
+            # Check if menu item is available
+            if not self.menu_item.is_available:
+                raise ValidationError("Menu item is not available")
         
-        # Check ingredient availability
-        if not menu_item.check_ingredient_availability():
-            raise ValidationError("Insufficient ingredient stock")
+        if not self._state.adding:
+            # Counted up in the database: a transition that committed since
+            # this instance was loaded must not get its version reused
+            self.version = models.F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
         
-        # Reduce ingredient stock if order is valid
-        for recipe_item in menu_item.recipe_items.all():
-            ingredient = recipe_item.ingredient
-            required_quantity = recipe_item.quantity
-            
-            ingredient.stock_quantity -= required_quantity
-            ingredient.save()
+        # Deduct stock, create the order and update the sales rollup
+        # together so a failed insert does not lose inventory
+        with transaction.atomic():
+            if self._state.adding:
+                self.reduce_ingredient_stock()
+            elif rebook:
+                from .stock import rebook_order_stock
+
+                rebook_order_stock(self, placed_menu_item_id, placed_quantity)
+            super().save(*args, **kwargs)
+            if previous_status == OrderStatus.COMPLETED:
+                record_sale_edit(self, getattr(self, '_loaded_sale', None))
+            record_status_change(self, previous_status, self.status)
+        if isinstance(self.version, models.Expression):
+            self.refresh_from_db(fields=['version'])
+        self._loaded_status = self.status
+        self._loaded_sale = (self.order_date, self.menu_item_id, self.quantity)
+    
+    def can_transition(self, new_status):
+        return new_status in ORDER_TRANSITIONS[self.status]
+    
+    def transition(self, new_status, expected_version=None):
+        """
+        Move the order to ``new_status`` if it is still at
+        ``expected_version`` (default: the version it was loaded with).
+
+        The row is updated with a compare-and-set on the version rather
+        than a lock, and only status, version and updated_at are written.
+        Raises OrderConflict when another write got there first and
+        ValidationError for a move the state machine does not allow.
+        Returns False when the order already has ``new_status``.
+        """
+        from .sales import record_status_change
+
+        if expected_version is None:
+            expected_version = self.version
+        if expected_version != self.version:
+            raise OrderConflict()
+        if new_status == self.status:
+            return False
+        if not self.can_transition(new_status):
+            raise ValidationError(
+                f"Cannot change order status from {self.get_status_display()} "
+                f"to {OrderStatus(new_status).label}"
+            )
         
-        super().save(*args, **kwargs)
+        updated_at = timezone.now()
+        with transaction.atomic():
+            updated = Order.objects.filter(pk=self.pk, version=expected_version).update(
+                status=new_status,
+                version=models.F('version') + 1,
+                updated_at=updated_at
+            )
+            if not updated:
+                raise OrderConflict()
+            record_status_change(self, self.status, new_status)
+            bump_versions(Order)
+        self.status = self._loaded_status = new_status
+        self.version = expected_version + 1
+        self.updated_at = updated_at
+        return True
+    
+    def delete(self, *args, **kwargs):
+        from .sales import record_status_change
+
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            record_status_change(self, self.status, None)
+        return result
     
     def __str__(self):
         return f"Order {self.id} - {self.menu_item.name} x{self.quantity}"
+
+class SalesRollup(models.Model):
+    """
+    Completed sales per day and menu item, kept up to date as orders move
+    in and out of the completed status
+    """
+    day = models.DateField()
+    menu_item = models.ForeignKey(
+        MenuItem, 
+        on_delete=models.CASCADE,
+        related_name='sales_rollups'
+    )
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=12, 
+        decimal_places=2, 
+        default=0
+    )
+
+    def __str__(self):
+        return f"{self.day} - {self.menu_item.name}: {self.quantity} sold"
+
+    class Meta:
+        unique_together = ('day', 'menu_item')
+
+class StockAlertKind(models.TextChoices):
+    LOW_STOCK = 'LOW', _('Low Stock')
+    RESTOCKED = 'OK', _('Restocked')
+    EXPIRED = 'EXP', _('Expired')
+
+class StockAlert(models.Model):
+    """
+    Persisted record of an ingredient crossing its minimum stock level (in
+    either direction) or passing its expiry date
+    """
+    ingredient = models.ForeignKey(
+        Ingredient, 
+        on_delete=models.CASCADE,
+        related_name='stock_alerts'
+    )
+    kind = models.CharField(
+        max_length=3, 
+        choices=StockAlertKind.choices
+    )
+    stock_quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    minimum_stock_level = models.DecimalField(max_digits=10, decimal_places=2)
+    expiry_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.ingredient.name}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingredient', 'kind'], name='stockalert_ingredient_kind_idx'),
+        ]
+
+class StockMovementReason(models.TextChoices):
+    INITIAL = 'INIT', _('Initial Stock')
+    ORDER = 'ORD', _('Order')
+    ADJUSTMENT = 'ADJ', _('Adjustment')
+    STOCKTAKE = 'CNT', _('Stocktake')
+    RECEIPT = 'RCV', _('Delivery Received')
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of stock changes. ``Ingredient.stock_quantity`` is
+    the running total of an ingredient's movements.
+    """
+    ingredient = models.ForeignKey(
+        Ingredient, 
+        on_delete=models.CASCADE,
+        related_name='stock_movements'
+    )
+    delta = models.DecimalField(max_digits=12, decimal_places=2)
+    reason = models.CharField(
+        max_length=4, 
+        choices=StockMovementReason.choices
+    )
+    order = models.ForeignKey(
+        Order, 
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.ingredient.name}: {self.delta:+} ({self.get_reason_display()})"
+
+    class Meta:
+        indexes = [
+            # Movements of one ingredient between a snapshot and a point in time
+            models.Index(fields=['ingredient', 'created_at'], name='movement_ingredient_time_idx'),
+        ]
+
+class StockSnapshot(models.Model):
+    """
+    Checkpoint of an ingredient's stock at ``taken_at``, so point-in-time
+    queries only sum the movements since the latest snapshot
+    """
+    ingredient = models.ForeignKey(
+        Ingredient, 
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots'
+    )
+    stock_quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    taken_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.ingredient.name} at {self.taken_at}: {self.stock_quantity}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingredient', 'taken_at'], name='snapshot_ingredient_time_idx'),
+        ]
+
+class IngredientLotQuerySet(models.QuerySet):
+    def open(self):
+        """
+        Lots with stock left
+        """
+        return self.filter(quantity__gt=0)
+    
+    def with_status(self):
+        return self.annotate(
+            expired=models.Case(
+                models.When(expiry_date__lt=timezone.now().date(), then=True),
+                default=False,
+                output_field=models.BooleanField()
+            )
+        )
+    
+    def in_consumption_order(self):
+        """
+        Per ingredient, the order lots are used up in: first expiry first
+        (LOT_CONSUMPTION_ORDER = 'expiry', the default) or oldest delivery
+        first ('received')
+        """
+        from django.conf import settings
+
+        if getattr(settings, 'LOT_CONSUMPTION_ORDER', 'expiry') == 'received':
+            return self.order_by('ingredient_id', 'received_date', 'id')
+        return self.order_by(
+            'ingredient_id', 
+            models.F('expiry_date').asc(nulls_last=True), 
+            'received_date', 
+            'id'
+        )
+
+class IngredientLot(models.Model):
+    """
+    One delivery of an ingredient. ``quantity`` is what is left of it;
+    ``Ingredient.stock_quantity`` stays the total, including any stock
+    that predates lot tracking.
+    """
+    ingredient = models.ForeignKey(
+        Ingredient, 
+        on_delete=models.CASCADE,
+        related_name='lots'
+    )
+    quantity = models.DecimalField(
+        max_digits=10, 
+        decimal_places=2, 
+        validators=[MinValueValidator(0)]
+    )
+    received_quantity = models.DecimalField(
+        max_digits=10, 
+        decimal_places=2, 
+        validators=[MinValueValidator(0)]
+    )
+    received_date = models.DateField(default=timezone.localdate)
+    expiry_date = models.DateField(null=True, blank=True)
+    
+    objects = IngredientLotQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.ingredient.name} lot {self.received_date}: {self.quantity}"
+
+    class Meta:
+        indexes = [
+            # expiring_soon is a range scan on expiry
+            models.Index(fields=['expiry_date'], name='lot_expiry_idx'),
+            # Consumption order per ingredient
+            models.Index(fields=['ingredient', 'expiry_date', 'received_date'], name='lot_ingredient_expiry_idx'),
+            models.Index(fields=['ingredient', 'received_date'], name='lot_ingredient_received_idx'),
+        ]
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination over ``(order_date, id)``: every page is an index
+    range scan and no COUNT(*) is issued, so deep pages stay cheap
+    """
+    ordering = ('-order_date', '-id')
@@ -0,0 +1,182 @@
+from django.db.models import F
+from django.utils.encoding import force_str
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+
+from .recipe_cache import ingredient_costs
+from .serializers import (
+    SupplierSerializer,
+    IngredientSerializer,
+    MenuItemSerializer,
+    OrderSerializer
+)
+
+
+class ValuesSerializer:
+    """
+    Read-only counterpart of a ModelSerializer for list responses.
+
+    Rows are fetched with ``values()`` (related names joined in, display
+    labels mapped from the field choices) and converted with the original
+    serializer's field instances, so the output is identical to
+    ``serializer_class(queryset, many=True).data`` without building a
+    model instance and a bound field set per object.
+
+    Fields the columns cannot provide are filled in by subclasses: model
+    method fields from annotations added by ``annotate`` (listed in
+    ``annotated_fields``) and SerializerMethodFields via
+    ``get_<field name>(row)``, with ``prepare(rows)`` for batch lookups.
+    """
+    serializer_class = None
+    # Serializer field name -> annotation holding its value
+    annotated_fields = {}
+    _columns = None
+
+    def annotate(self, queryset):
+        return queryset
+
+    def prepare(self, rows):
+        """
+        Hook to load anything ``get_<field name>`` needs for ``rows``
+        """
+
+    @classmethod
+    def columns(cls):
+        """
+        ``(field name, kind, detail)`` per serializer field, in output order
+        """
+        if cls.__dict__.get('_columns') is None:
+            model = cls.serializer_class.Meta.model
+            columns = []
+            for name, field in cls.serializer_class().fields.items():
+                source = field.source
+                if name in cls.annotated_fields:
+                    columns.append((name, 'value', (cls.annotated_fields[name], None)))
+                elif isinstance(field, serializers.SerializerMethodField):
+                    columns.append((name, 'method', f'get_{name}'))
+                elif isinstance(field, ManyRelatedField):
+                    columns.append((name, 'many', model._meta.get_field(source)))
+                elif isinstance(field, RelatedField):
+                    # values() yields the primary key of the related row
+                    columns.append((name, 'value', (source, None)))
+                elif source.startswith('get_') and source.endswith('_display'):
+                    columns.append((name, 'display', model._meta.get_field(source[4:-8])))
+                else:
+                    columns.append((name, 'value', (source.replace('.', '__'), field.to_representation)))
+            cls._columns = columns
+        return cls._columns
+
+    def values(self, queryset):
+        """
+        ``queryset`` as dicts holding every column the serializer needs
+        """
+        queryset = self.annotate(queryset.prefetch_related(None))
+        lookups = {'pk', *queryset.query.annotations}
+        for name, kind, detail in self.columns():
+            if kind == 'value':
+                lookups.add(detail[0])
+            elif kind == 'display':
+                lookups.add(detail.attname)
+        return queryset.values(*lookups)
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        self.prepare(rows)
+
+        columns = []
+        for name, kind, detail in self.columns():
+            if kind == 'value':
+                lookup, convert = detail
+                columns.append((name, lookup, convert))
+            elif kind == 'display':
+                # Same labels as get_FOO_display(), in the active language
+                labels = {value: force_str(label) for value, label in detail.flatchoices}
+                columns.append((name, detail.attname, lambda value, labels=labels: str(labels.get(value, value))))
+            elif kind == 'method':
+                columns.append((name, None, getattr(self, detail)))
+            else:
+                columns.append((name, None, self._many_related(detail, rows)))
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, convert in columns:
+                if lookup is None:
+                    item[name] = convert(row)
+                    continue
+                value = row[lookup]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+    def _many_related(self, field, rows):
+        """
+        Related primary keys per row for a many-to-many field, read from
+        its through table in one query
+        """
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        related = {row['pk']: [] for row in rows}
+        pairs = through.objects.filter(**{f'{source}__in': list(related)}).values_list(
+            f'{source}_id', f'{target}_id'
+        )
+        for pk, related_pk in pairs:
+            related[pk].append(related_pk)
+        return lambda row: related[row['pk']]
+
+
+class SupplierValuesSerializer(ValuesSerializer):
+    serializer_class = SupplierSerializer
+
+
+class IngredientValuesSerializer(ValuesSerializer):
+    serializer_class = IngredientSerializer
+    annotated_fields = {'is_low_stock': 'low_stock', 'is_expired': 'expired'}
+
+    def annotate(self, queryset):
+        return queryset.with_status()
+
+
+class MenuItemValuesSerializer(ValuesSerializer):
+    serializer_class = MenuItemSerializer
+
+    def prepare(self, rows):
+        self.costs = ingredient_costs(row['pk'] for row in rows)
+
+    def get_ingredient_cost(self, row):
+        return self.costs[row['pk']]
+
+    def get_ingredient_availability(self, row):
+        return row['servable_portions'] is None or row['servable_portions'] >= 1
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    serializer_class = OrderSerializer
+
+    def annotate(self, queryset):
+        return queryset.annotate(menu_item_price=F('menu_item__price'))
+
+    def get_total_price(self, row):
+        # Order.calculate_total_price()
+        return row['menu_item_price'] * row['quantity']
+
+
+class ValuesListMixin:
+    """
+    Serve the list action through ``values_serializer_class``; every
+    other action keeps the regular serializer
+    """
+    values_serializer_class = None
+
+    def values_response(self, queryset, paginate=False):
+        values_serializer = self.values_serializer_class()
+        rows = values_serializer.values(queryset)
+        if paginate:
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(rows))
+
+    def list(self, request, *args, **kwargs):
+        return self.values_response(self.filter_queryset(self.get_queryset()), paginate=True)
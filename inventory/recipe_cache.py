@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import MenuItem
+
+
+def _cache():
+    return caches[getattr(settings, 'RECIPE_STATS_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'RECIPE_STATS_CACHE_TIMEOUT', 60 * 60)
+
+
+def cache_key(menu_item_id):
+    return f"inventory:menu_item_stats:{menu_item_id}"
+
+
+def ingredient_costs(menu_item_ids):
+    """
+    Ingredient cost per menu item id.
+
+    Values come from the cache where possible; all misses are computed
+    together with one annotated query and written back.
+    """
+    keys = {cache_key(pk): pk for pk in menu_item_ids}
+    if not keys:
+        return {}
+
+    cache = _cache()
+    stats = cache.get_many(list(keys))
+    missing = [pk for key, pk in keys.items() if key not in stats]
+    if missing:
+        fresh = {
+            cache_key(pk): cost
+            for pk, cost in (
+                MenuItem.objects.filter(pk__in=missing)
+                .with_ingredient_stats()
+                .values_list('pk', 'ingredient_cost')
+            )
+        }
+        cache.set_many(fresh, timeout=_timeout())
+        stats.update(fresh)
+
+    return {pk: stats[key] for key, pk in keys.items()}
+
+
+def attach_ingredient_stats(menu_items):
+    """
+    Set ``ingredient_cost`` on each menu item from ``ingredient_costs``.
+
+    Availability does not need caching, it is read from
+    ``servable_portions``.
+    """
+    pending = [
+        menu_item for menu_item in menu_items
+        if not hasattr(menu_item, 'ingredient_cost')
+    ]
+    costs = ingredient_costs(menu_item.pk for menu_item in pending)
+    for menu_item in pending:
+        menu_item.ingredient_cost = costs[menu_item.pk]
+
+
+def invalidate_menu_items(menu_item_ids):
+    """
+    Drop cached stats for the given menu items once the current
+    transaction commits
+    """
+    keys = [cache_key(pk) for pk in set(menu_item_ids)]
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
+
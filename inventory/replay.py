@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+
+from django.test import Client
+
+from .bench import percentile
+
+
+# Only API traffic is captured by default; admin and auth pages carry
+# credentials and session tokens
+CAPTURE_PATH_PREFIXES = ('/api/',)
+
+# Body and query fields whose values are never written to a capture
+SENSITIVE_FIELDS = {
+    'password', 'password1', 'password2', 'old_password', 'new_password',
+    'new_password1', 'new_password2', 'token', 'access_token', 'refresh_token',
+    'api_key', 'secret', 'csrfmiddlewaretoken',
+}
+REDACTED = '[REDACTED]'
+
+
+def _redact_pairs(pairs):
+    return [(key, REDACTED if key.lower() in SENSITIVE_FIELDS else value) for key, value in pairs]
+
+
+def _redact_json(value):
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in SENSITIVE_FIELDS else _redact_json(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact_json(item) for item in value]
+    return value
+
+
+def redact_query(query):
+    if not query:
+        return query
+    return urlencode(_redact_pairs(parse_qsl(query, keep_blank_values=True)))
+
+
+def redact_body(body, content_type):
+    """
+    ``body`` as text with sensitive fields masked. JSON and form bodies
+    are rewritten; any other non-empty body is dropped, since it cannot
+    be checked.
+    """
+    if not body:
+        return ''
+    text = body.decode('utf-8', errors='replace')
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    if media_type == 'application/json' or media_type.endswith('+json'):
+        try:
+            return json.dumps(_redact_json(json.loads(text)))
+        except ValueError:
+            return ''
+    if media_type == 'application/x-www-form-urlencoded':
+        return redact_query(text)
+    return ''
+
+
+class RequestCapture:
+    """
+    Append-only JSONL writer for captured requests; one line per request so
+    concurrent workers can share the file.
+
+    Only paths under ``path_prefixes`` are captured, and the values of
+    SENSITIVE_FIELDS in bodies and query strings are masked.
+    """
+    def __init__(self, path, path_prefixes=CAPTURE_PATH_PREFIXES):
+        self.path = path
+        self.path_prefixes = tuple(path_prefixes)
+        self._lock = threading.Lock()
+
+    def wants(self, request):
+        return request.path.startswith(self.path_prefixes)
+
+    def record(self, request, body, response, started_at, duration_ns, route):
+        if not self.wants(request):
+            return
+        content_type = request.META.get('CONTENT_TYPE', '')
+        entry = {
+            'timestamp': started_at,
+            'method': request.method,
+            'path': request.path,
+            'query': redact_query(request.META.get('QUERY_STRING', '')),
+            'content_type': content_type,
+            'body': redact_body(body, content_type),
+            'route': route,
+            'status': response.status_code,
+            'duration_ms': round(duration_ns / 1e6, 3),
+        }
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as handle:
+                handle.write(line)
+
+
+def load_capture(path):
+    """
+    Captured requests from a JSONL file, oldest first
+    """
+    with open(path) as handle:
+        entries = [json.loads(line) for line in handle if line.strip()]
+    return sorted(entries, key=lambda entry: entry['timestamp'])
+
+
+class _ClientTransport:
+    """
+    Send requests to this process's WSGI handler, one test client per thread
+    """
+    def __init__(self, host):
+        self.host = host
+        self._local = threading.local()
+
+    def send(self, entry):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(HTTP_HOST=self.host)
+        path = entry['path'] + (f"?{entry['query']}" if entry['query'] else '')
+        response = client.generic(
+            entry['method'],
+            path,
+            entry['body'].encode('utf-8'),
+            content_type=entry['content_type'] or 'application/octet-stream'
+        )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+
+class _HTTPTransport:
+    """
+    Send requests to a running server
+    """
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def send(self, entry):
+        url = self.base_url + entry['path'] + (f"?{entry['query']}" if entry['query'] else '')
+        body = entry['body'].encode('utf-8') if entry['body'] else None
+        request = urllib.request.Request(url, data=body, method=entry['method'])
+        if entry['content_type']:
+            request.add_header('Content-Type', entry['content_type'])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+
+def replay(entries, concurrency=8, speedup=1.0, base_url=None, host='localhost'):
+    """
+    Replay captured requests with their original spacing divided by
+    ``speedup`` (0 sends as fast as possible) on ``concurrency`` threads.
+
+    Requests go through the in-process Django handler unless ``base_url``
+    points at a running server. Returns latency and error statistics per
+    endpoint and overall.
+    """
+    transport = _HTTPTransport(base_url) if base_url else _ClientTransport(host)
+    results = []
+    results_lock = threading.Lock()
+
+    def send(entry):
+        started = time.perf_counter_ns()
+        try:
+            status_code = transport.send(entry)
+        except Exception:
+            status_code = None
+        duration_ns = time.perf_counter_ns() - started
+        endpoint = f"{entry['method']} {entry.get('route') or entry['path']}"
+        with results_lock:
+            results.append((endpoint, status_code, duration_ns))
+
+    started = time.perf_counter()
+    if entries:
+        first_timestamp = entries[0]['timestamp']
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for entry in entries:
+                if speedup:
+                    delay = (entry['timestamp'] - first_timestamp) / speedup
+                    wait = started + delay - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                executor.submit(send, entry)
+    elapsed = time.perf_counter() - started
+
+    by_endpoint = {}
+    for endpoint, status_code, duration_ns in results:
+        by_endpoint.setdefault(endpoint, []).append((status_code, duration_ns))
+    by_endpoint['ALL'] = [(status_code, duration_ns) for _, status_code, duration_ns in results]
+
+    return {
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else 0,
+        'endpoints': {
+            endpoint: _summarize(samples)
+            for endpoint, samples in sorted(by_endpoint.items())
+            if samples
+        },
+    }
+
+
+def _summarize(samples):
+    durations = sorted(duration_ns for _, duration_ns in samples)
+    errors = sum(1 for status_code, _ in samples if status_code is None or status_code >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4),
+        'p50_ms': round(percentile(durations, 50) / 1e6, 3),
+        'p90_ms': round(percentile(durations, 90) / 1e6, 3),
+        'p99_ms': round(percentile(durations, 99) / 1e6, 3),
+        'max_ms': round(durations[-1] / 1e6, 3),
+    }
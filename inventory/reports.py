@@ -0,0 +1,77 @@
+from decimal import Decimal
+
+from .models import MenuItem
+
+# Menu engineering quadrants by (popular, profitable)
+QUADRANTS = {
+    (True, True): 'star',
+    (True, False): 'plowhorse',
+    (False, True): 'puzzle',
+    (False, False): 'dog',
+}
+
+
+def menu_engineering(menu_items=None, start=None, end=None):
+    """
+    Margin, food cost and popularity/profitability quadrant per menu item
+    for completed sales between ``start`` and ``end``.
+
+    All figures come from one aggregated query
+    (``MenuItemQuerySet.with_sales_stats``). Quadrants follow the usual
+    menu engineering rules: an item is popular when it sells at least 70%
+    of an equal share of all units, and profitable when its contribution
+    margin per unit (price minus theoretical ingredient cost) is at least
+    the sales-weighted average.
+    """
+    if menu_items is None:
+        menu_items = MenuItem.objects.all()
+    rows = list(
+        menu_items
+        .with_sales_stats(start, end)
+        .order_by('name')
+        .values(
+            'id', 'name', 'category', 'price', 'units', 'revenue',
+            'unit_cost', 'ingredient_cost', 'margin', 'food_cost_percentage'
+        )
+    )
+
+    total_units = sum(row['units'] for row in rows)
+    total_revenue = sum((row['revenue'] for row in rows), Decimal(0))
+    total_cost = sum((row['ingredient_cost'] for row in rows), Decimal(0))
+    total_margin = total_revenue - total_cost
+
+    popularity_threshold = Decimal(total_units) / len(rows) * Decimal('0.7') if rows else Decimal(0)
+    margin_threshold = total_margin / total_units if total_units else Decimal(0)
+
+    results = []
+    for row in rows:
+        unit_margin = row['price'] - row['unit_cost']
+        popular = total_units > 0 and row['units'] >= popularity_threshold
+        profitable = unit_margin >= margin_threshold
+        results.append({
+            'item_id': row['id'],
+            'item_name': row['name'],
+            'category': row['category'],
+            'units': row['units'],
+            'revenue': row['revenue'],
+            'ingredient_cost': row['ingredient_cost'],
+            'margin': row['margin'],
+            'food_cost_percentage': row['food_cost_percentage'],
+            'unit_margin': unit_margin.quantize(Decimal('0.01')),
+            'quadrant': QUADRANTS[popular, profitable],
+        })
+
+    return {
+        'start': start,
+        'end': end,
+        'units': total_units,
+        'revenue': total_revenue,
+        'ingredient_cost': total_cost,
+        'margin': total_margin,
+        'food_cost_percentage': (
+            (total_cost * 100 / total_revenue).quantize(Decimal('0.01')) if total_revenue else None
+        ),
+        'popularity_threshold': popularity_threshold.quantize(Decimal('0.01')),
+        'unit_margin_threshold': margin_threshold.quantize(Decimal('0.01')),
+        'results': results,
+    }
@@ -0,0 +1,97 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .db_routers import primary_for_recent_changes
+from .metrics import get_registry, route_name
+from .versions import get_versions
+
+
+def get_response_cache():
+    """
+    Cache configured by RESPONSE_CACHE_ALIAS, or None when response
+    caching is switched off
+    """
+    alias = getattr(settings, 'RESPONSE_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def response_key(request, versions):
+    """
+    Cache key for ``request`` at the model generations ``versions``.
+
+    The query string is normalized (sorted, blank values dropped) so
+    equivalent requests share an entry. Generations are part of the key,
+    so a write to any of the models moves readers to new keys and the old
+    entries simply expire.
+    """
+    query = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    fingerprint = '|'.join([
+        request.build_absolute_uri(request.path),
+        repr(query),
+        timezone.localdate().isoformat(),
+        *map(str, versions),
+    ])
+    return "inventory:response:%s" % hashlib.md5(
+        fingerprint.encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def cache_response(*models):
+    """
+    Cache the data of a successful viewset GET, keyed by
+    ``response_key``; ``models`` are everything the response is built from
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return view_method(self, request, *args, **kwargs)
+
+            versions = get_versions(models or self.version_models)
+            key = response_key(request, versions)
+            data = cache.get(key)
+            get_registry().cache_lookup(route_name(request), data is not None)
+            if data is not None:
+                return Response(data)
+
+            # The response is stored under these versions, so it has to
+            # include their changes
+            primary_for_recent_changes(versions)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    response.data,
+                    getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+class CachedResponseMixin:
+    """
+    Response caching for viewset list and detail reads, keyed by the
+    generations of the viewset's ``version_models``
+    """
+    version_models = ()
+
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
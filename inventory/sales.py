@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MenuItem, Order, OrderStatus, SalesRollup
+from .versions import bump_versions
+
+
+def _add_to_rollup(day, menu_item_id, quantity, revenue):
+    rollup = SalesRollup.objects.filter(day=day, menu_item_id=menu_item_id)
+    changes = {
+        'quantity': F('quantity') + quantity,
+        'revenue': F('revenue') + revenue,
+    }
+    bump_versions(SalesRollup)
+    if rollup.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(
+                day=day, 
+                menu_item_id=menu_item_id, 
+                quantity=quantity, 
+                revenue=revenue
+            )
+    except IntegrityError:
+        # Another order created the row first
+        rollup.update(**changes)
+
+
+def record_status_change(order, previous_status, new_status):
+    """
+    Apply an order's status transition to the sales rollup.
+
+    Only moves into or out of COMPLETED change the rollup; ``None`` stands
+    for an order that does not exist (before creation, after deletion).
+    """
+    was_completed = previous_status == OrderStatus.COMPLETED
+    is_completed = new_status == OrderStatus.COMPLETED
+    if was_completed == is_completed:
+        return
+
+    sign = 1 if is_completed else -1
+    _add_to_rollup(
+        timezone.localdate(order.order_date),
+        order.menu_item_id,
+        sign * order.quantity,
+        sign * order.calculate_total_price()
+    )
+
+
+def record_sale_edit(order, previous):
+    """
+    Move a completed order's share of the rollup after an edit of its
+    date, menu item or quantity. ``previous`` is the stored
+    ``(order_date, menu_item_id, quantity)`` the rollup counted.
+    """
+    current = (order.order_date, order.menu_item_id, order.quantity)
+    # None: loaded with deferred fields, so the stored sale is unknown
+    if previous is None or None in previous or previous == current:
+        return
+    order_date, menu_item_id, quantity = previous
+    if menu_item_id == order.menu_item_id:
+        price = order.menu_item.price
+    else:
+        price = MenuItem.objects.values_list('price', flat=True).get(pk=menu_item_id)
+    _add_to_rollup(timezone.localdate(order_date), menu_item_id, -quantity, -quantity * price)
+    _add_to_rollup(
+        timezone.localdate(order.order_date),
+        order.menu_item_id,
+        order.quantity,
+        order.calculate_total_price()
+    )
+
+
+def reprice_sales_rollup(menu_item):
+    """
+    Recompute the revenue of ``menu_item``'s rollup rows at its current
+    price, as rebuild_sales_rollup would
+    """
+    bump_versions(SalesRollup)
+    SalesRollup.objects.filter(menu_item=menu_item).update(
+        revenue=F('quantity') * Decimal(str(menu_item.price))
+    )
+
+
+def rebuild_sales_rollup():
+    """
+    Recompute the whole rollup table from the order history
+    """
+    totals = (
+        Order.objects
+        .filter(status=OrderStatus.COMPLETED)
+        .annotate(day=TruncDate('order_date'))
+        .values('day', 'menu_item')
+        .annotate(
+            units=Sum('quantity'),
+            total=Sum(ExpressionWrapper(
+                F('menu_item__price') * F('quantity'), 
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ))
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        bump_versions(SalesRollup)
+        SalesRollup.objects.all().delete()
+        rollups = SalesRollup.objects.bulk_create(
+            (
+                SalesRollup(
+                    day=row['day'], 
+                    menu_item_id=row['menu_item'], 
+                    quantity=row['units'], 
+                    revenue=row['total']
+                )
+                for row in totals.iterator()
+            ),
+            batch_size=1000
+        )
+    return len(rollups)
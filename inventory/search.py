@@ -0,0 +1,248 @@
+import re
+
+from django.apps import apps as global_apps
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+# Model -> indexed lookups (the viewsets' search_fields). Related lookups
+# follow one foreign key and are re-indexed when the related row changes.
+# The search tables are created by migrations (0011_search_index), so a
+# change here needs a migration of its own.
+SEARCH_INDEXES = {
+    'inventory.supplier': ['name', 'contact_person', 'email'],
+    'inventory.ingredient': ['name'],
+    'inventory.menuitem': ['name', 'description'],
+    'inventory.order': ['customer_name', 'menu_item__name'],
+}
+
+TERM_RE = re.compile(r'\w+')
+
+
+class SQLiteSearchBackend:
+    """
+    FTS5 over an external content table per model.
+
+    ``<table>_search`` holds one row per object (``object_id`` is its
+    primary key as stored); triggers mirror it into the ``<table>_fts``
+    FTS5 table, whose rowid is the content row's INTEGER PRIMARY KEY.
+    Terms match as prefixes and results are ranked by bm25.
+    """
+    rank_descending = False
+
+    def upsert_sql(self, table, columns, select_sql):
+        column_list = ', '.join(columns)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns)
+        # "WHERE true" keeps SQLite from reading ON CONFLICT as a join clause
+        return (
+            f'INSERT INTO {table}_search (object_id, {column_list}) '
+            f'SELECT * FROM ({select_sql}) WHERE true '
+            f'ON CONFLICT (object_id) DO UPDATE SET {updates}'
+        )
+
+    def match_query(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def matching_keys_sql(self, table):
+        return (
+            f'SELECT {table}_search.object_id FROM {table}_fts '
+            f'JOIN {table}_search ON {table}_search.rowid = {table}_fts.rowid '
+            f'WHERE {table}_fts MATCH %s'
+        )
+
+    def rank_sql(self, table, key_column):
+        # A rowid lookup per matched object, not a second full-text scan
+        return (
+            f'SELECT rank FROM {table}_fts WHERE {table}_fts MATCH %s AND rowid = '
+            f'(SELECT rowid FROM {table}_search WHERE object_id = {key_column})'
+        )
+
+
+class PostgresSearchBackend:
+    """
+    ``tsvector`` documents in a ``<table>_search`` table per model with a
+    GIN index, built with the 'simple' configuration (names and emails
+    are not stemmed). Terms match as prefixes and results are ranked by
+    ``ts_rank``.
+    """
+    rank_descending = True
+
+    def upsert_sql(self, table, columns, select_sql):
+        document = ', '.join(f's.{column}' for column in columns)
+        return (
+            f'INSERT INTO {table}_search (object_id, document) '
+            f"SELECT s.object_id, to_tsvector('simple', concat_ws(' ', {document})) "
+            f'FROM ({select_sql}) AS s(object_id, {", ".join(columns)}) '
+            f'ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document'
+        )
+
+    def match_query(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def matching_keys_sql(self, table):
+        return (
+            f"SELECT object_id FROM {table}_search WHERE document @@ to_tsquery('simple', %s)"
+        )
+
+    def rank_sql(self, table, key_column):
+        return (
+            f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {table}_search "
+            f'WHERE object_id = {key_column}'
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend(),
+    'postgresql': PostgresSearchBackend(),
+}
+
+
+def get_backend(db_connection=None):
+    """
+    Full-text backend for the connection's database, or None when it has
+    none (searches then fall back to SearchFilter)
+    """
+    return BACKENDS.get((db_connection or connection).vendor)
+
+
+def _columns(fields):
+    return [field.replace('__', '_') for field in fields]
+
+
+def index_objects(model, **filters):
+    """
+    (Re-)index the objects of ``model`` matching ``filters`` (all of them
+    by default) with one INSERT ... SELECT
+    """
+    backend = get_backend()
+    if backend is None:
+        return
+    fields = SEARCH_INDEXES[model._meta.label_lower]
+    columns = _columns(fields)
+    # Select list: primary key, then the fields in column order
+    rows = (
+        model._base_manager.using(connection.alias)
+        .filter(**filters)
+        .order_by()
+        .values_list('pk', *fields)
+    )
+    select_sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(backend.upsert_sql(model._meta.db_table, columns, select_sql), params)
+
+
+def unindex_objects(model, pks):
+    backend = get_backend()
+    if backend is None:
+        return
+    pk_field = model._meta.pk
+    keys = [pk_field.get_db_prep_value(pk, connection) for pk in pks]
+    if not keys:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {model._meta.db_table}_search WHERE object_id IN ({", ".join(["%s"] * len(keys))})',
+            keys
+        )
+
+
+def rebuild_search_index():
+    """
+    Re-index every indexed model; returns the number of models
+    """
+    for label in SEARCH_INDEXES:
+        index_objects(global_apps.get_model(label))
+    return len(SEARCH_INDEXES)
+
+
+def dependent_indexes(model):
+    """
+    ``(indexed model, foreign key name, related field names)`` for every
+    index that includes fields of ``model`` through a foreign key
+    """
+    dependents = []
+    for label, fields in SEARCH_INDEXES.items():
+        indexed = global_apps.get_model(label)
+        related = {}
+        for field in fields:
+            if '__' not in field:
+                continue
+            fk_name, related_field = field.split('__', 1)
+            if indexed._meta.get_field(fk_name).related_model is model:
+                related.setdefault(fk_name, []).append(related_field)
+        dependents.extend((indexed, fk_name, names) for fk_name, names in related.items())
+    return dependents
+
+
+def remember_indexed_values(instance):
+    """
+    Before saving ``instance``, keep the stored values that other indexes
+    copy so ``update_dependents`` only re-indexes when they change
+    """
+    if instance._state.adding:
+        return
+    stored = {}
+    for indexed, fk_name, names in dependent_indexes(type(instance)):
+        stored[fk_name, indexed] = type(instance)._base_manager.filter(
+            pk=instance.pk
+        ).values_list(*names).first()
+    instance._indexed_values = stored
+
+
+def update_dependents(instance):
+    stored = getattr(instance, '_indexed_values', {})
+    for indexed, fk_name, names in dependent_indexes(type(instance)):
+        current = tuple(getattr(instance, name) for name in names)
+        if (fk_name, indexed) in stored and stored[fk_name, indexed] != current:
+            index_objects(indexed, **{fk_name: instance.pk})
+    instance._indexed_values = {}
+
+
+def search(queryset, text):
+    """
+    Objects of ``queryset`` matching every word of ``text`` as a prefix,
+    annotated with ``search_rank`` and best matches first. Text without
+    any word (only punctuation) filters nothing, like an empty search.
+    """
+    backend = get_backend()
+    terms = TERM_RE.findall(text)
+    if not terms:
+        return queryset
+    model = queryset.model
+    table = model._meta.db_table
+    match = backend.match_query(terms)
+    key_column = f'{connection.ops.quote_name(table)}.{connection.ops.quote_name(model._meta.pk.column)}'
+    rank = '-search_rank' if backend.rank_descending else 'search_rank'
+    return (
+        queryset
+        .filter(pk__in=RawSQL(backend.matching_keys_sql(table), (match,)))
+        .annotate(search_rank=RawSQL(backend.rank_sql(table, key_column), (match,)))
+        .order_by(rank, 'pk')
+    )
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in SearchFilter backed by the full-text index when the view's
+    ``search_fields`` are exactly the indexed fields of its model and the
+    database has a search backend; otherwise plain SearchFilter.
+
+    ``?search=`` words match as prefixes (``piz marg`` finds "Pizza
+    Margherita") and results are ordered by relevance unless an
+    ``ordering`` applies.
+    """
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        indexed_fields = SEARCH_INDEXES.get(queryset.model._meta.label_lower)
+        if (
+            not search_fields
+            or get_backend() is None
+            or indexed_fields is None
+            or set(search_fields) != set(indexed_fields)
+        ):
+            return super().filter_queryset(request, queryset, view)
+
+        text = ' '.join(self.get_search_terms(request))
+        if not text:
+            return queryset
+        return search(queryset, text)
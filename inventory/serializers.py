@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 from .models import (
     Supplier, 
@@ -8,8 +11,12 @@ from .models import (
     IngredientUnit, 
     StorageType, 
     MenuItemCategory, 
-    OrderStatus
+    OrderStatus,
+    StockAlert,
+    StockMovement,
+    IngredientLot
 )
+from .recipe_cache import attach_ingredient_stats
 
 class SupplierSerializer(serializers.ModelSerializer):
     category_display = serializers.CharField(
@@ -51,6 +58,13 @@ class IngredientSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'is_low_stock', 'is_expired']
 
+class MenuItemListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Look up the cached ingredient stats for the whole page at once
+        menu_items = list(data.all() if hasattr(data, 'all') else data)
+        attach_ingredient_stats(menu_items)
+        return super().to_representation(menu_items)
+
 class MenuItemSerializer(serializers.ModelSerializer):
     category_display = serializers.CharField(
         source='get_category_display', 
@@ -68,15 +82,20 @@ class MenuItemSerializer(serializers.ModelSerializer):
             'price', 'recipe', 
             'preparation_time_minutes', 
             'ingredient_cost', 
-            'ingredient_availability'
+            'ingredient_availability', 
+            'servable_portions'
         ]
         read_only_fields = ['id', 'ingredient_cost', 'ingredient_availability']
+        list_serializer_class = MenuItemListSerializer
     
+    # Cost is annotated by MenuItem.objects.with_ingredient_stats() or
+    # filled in from the recipe stats cache
     def get_ingredient_cost(self, obj):
-        return obj.calculate_ingredient_cost()
+        attach_ingredient_stats([obj])
+        return obj.ingredient_cost
     
     def get_ingredient_availability(self, obj):
-        return obj.check_ingredient_availability()
+        return obj.servable_portions is None or obj.servable_portions >= 1
 
 class OrderSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.CharField(
@@ -96,18 +115,151 @@ class OrderSerializer(serializers.ModelSerializer):
             'quantity', 'customer_name', 
             'special_instructions', 'order_date', 
             'status', 'status_display', 
-            'total_price'
+            'total_price', 'version', 'updated_at'
         ]
-        read_only_fields = ['id', 'order_date', 'total_price']
+        read_only_fields = ['id', 'order_date', 'total_price', 'version', 'updated_at']
     
     def get_total_price(self, obj):
         return obj.calculate_total_price()
 
+    def validate_status(self, value):
+        # Status changes need the version check of update_status; a plain
+        # edit would overwrite a concurrent transition
+        if self.instance is not None and value != self.instance.status:
+            raise serializers.ValidationError(
+                "Use the update_status action to change the status of an order"
+            )
+        return value
+
     def validate(self, data):
-        # Custom validation for order creation
+        # Custom validation for order creation; an edit of the menu item or
+        # quantity is checked against stock when the order is saved
+        if self.instance is not None:
+            return data
         menu_item = data.get('menu_item')
-        if not menu_item.check_ingredient_availability():
+        if not menu_item.check_ingredient_availability(data.get('quantity', 1)):
             raise serializers.ValidationError(
                 "Not enough ingredients to complete this order"
             )
         return data
+
+    def create(self, validated_data):
+        # Stock is re-checked atomically when the order is saved; a
+        # concurrent order may have used up the ingredients since validate()
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+
+    def update(self, instance, validated_data):
+        # Write only the submitted fields that differ, so the status (and
+        # anything else changed since the order was loaded) is left as it
+        # is; with nothing to write the version is not bumped either
+        changed = {
+            attr: value for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        }
+        if not changed:
+            return instance
+        for attr, value in changed.items():
+            setattr(instance, attr, value)
+        try:
+            instance.save(update_fields=list(changed))
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return instance
+
+class OrderBatchSerializer(serializers.ModelSerializer):
+    """
+    Input format for one order in a batch; the menu item is taken as a
+    plain id so the whole batch can be resolved with a single query
+    """
+    menu_item = serializers.UUIDField()
+    
+    class Meta:
+        model = Order
+        fields = [
+            'menu_item', 'quantity', 
+            'customer_name', 'special_instructions'
+        ]
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    """
+    One row of a bulk stock adjustment: either a ``delta`` to add to the
+    current stock or an absolute ``count`` from a stocktake
+    """
+    ingredient = serializers.UUIDField()
+    delta = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    count = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    
+    def validate(self, data):
+        if ('delta' in data) == ('count' in data):
+            raise serializers.ValidationError("Provide either delta or count")
+        return data
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(
+        source='ingredient.name', 
+        read_only=True
+    )
+    kind_display = serializers.CharField(
+        source='get_kind_display', 
+        read_only=True
+    )
+    
+    class Meta:
+        model = StockAlert
+        fields = [
+            'id', 'ingredient', 'ingredient_name', 
+            'kind', 'kind_display', 
+            'stock_quantity', 'minimum_stock_level', 
+            'expiry_date', 'created_at'
+        ]
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(
+        source='ingredient.name', 
+        read_only=True
+    )
+    reason_display = serializers.CharField(
+        source='get_reason_display', 
+        read_only=True
+    )
+    
+    class Meta:
+        model = StockMovement
+        fields = [
+            'id', 'ingredient', 'ingredient_name', 
+            'delta', 'reason', 'reason_display', 
+            'order', 'created_at'
+        ]
+
+class IngredientLotSerializer(serializers.ModelSerializer):
+    """
+    Lots are read from ``IngredientLot.objects.with_status()``, which
+    annotates ``expired``
+    """
+    ingredient_name = serializers.CharField(
+        source='ingredient.name', 
+        read_only=True
+    )
+    is_expired = serializers.BooleanField(
+        source='expired', 
+        read_only=True
+    )
+    
+    class Meta:
+        model = IngredientLot
+        fields = [
+            'id', 'ingredient', 'ingredient_name', 
+            'quantity', 'received_quantity', 
+            'received_date', 'expiry_date', 'is_expired'
+        ]
+
+class LotReceiptSerializer(serializers.Serializer):
+    """
+    Input format for a delivery booked into an ingredient's stock
+    """
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    expiry_date = serializers.DateField(required=False, allow_null=True)
+    received_date = serializers.DateField(required=False)
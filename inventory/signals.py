@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Supplier, Ingredient, MenuItem, RecipeItem, Order
+from .recipe_cache import invalidate_menu_items
+from .versions import bump_versions
+from .alerts import check_ingredient
+from .ledger import record_ingredient_save
+from .sales import reprice_sales_rollup
+from .stock import consume_lots
+from .search import index_objects, remember_indexed_values, unindex_objects, update_dependents
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    # Before check_ingredient, which moves the loaded stock forward
+    movement = record_ingredient_save(instance, created=created)
+    if movement is not None and movement.delta < 0:
+        # Stock lowered by hand (API update, admin) comes out of the lots
+        # like any other deduction
+        with transaction.atomic():
+            consume_lots({instance.pk: -movement.delta})
+    check_ingredient(instance, created=created)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    menu_items = MenuItem.objects.filter(recipe_items__ingredient=instance)
+    invalidate_menu_items(menu_items.values_list('pk', flat=True))
+    menu_items.refresh_servable_portions()
+
+
+@receiver([post_save, post_delete], sender=RecipeItem)
+def recipe_item_changed(sender, instance, **kwargs):
+    invalidate_menu_items([instance.menu_item_id])
+    MenuItem.objects.filter(pk=instance.menu_item_id).refresh_servable_portions()
+
+
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=RecipeItem)
+@receiver([post_save, post_delete], sender=Order)
+def model_changed(sender, **kwargs):
+    bump_versions(sender)
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Order)
+def search_document_saved(sender, instance, **kwargs):
+    index_objects(sender, pk=instance.pk)
+
+
+@receiver(pre_delete, sender=Supplier)
+@receiver(pre_delete, sender=Ingredient)
+@receiver(pre_delete, sender=MenuItem)
+@receiver(pre_delete, sender=Order)
+def search_document_deleted(sender, instance, **kwargs):
+    unindex_objects(sender, [instance.pk])
+
+
+@receiver(pre_save, sender=MenuItem)
+def menu_item_saving(sender, instance, **kwargs):
+    # Orders index the menu item name
+    remember_indexed_values(instance)
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, **kwargs):
+    update_dependents(instance)
+    previous_price = getattr(instance, '_loaded_price', None)
+    if previous_price is not None and previous_price != instance.price:
+        # Completed sales are valued at the current price
+        reprice_sales_rollup(instance)
+    instance._loaded_price = instance.price
@@ -0,0 +1,407 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, F, Min, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .alerts import record_deductions, record_stock_changes
+from .models import (
+    Ingredient,
+    IngredientLot,
+    MenuItem,
+    Order,
+    RecipeItem,
+    StockMovement,
+    StockMovementReason
+)
+from .recipe_cache import invalidate_menu_items
+from .search import index_objects
+from .versions import bump_versions
+
+
+def to_decimal(value):
+    """
+    Convert a recipe quantity (stored as a float) to a Decimal without
+    picking up binary rounding noise
+    """
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def order_movements(orders):
+    """
+    Ledger entries for the ingredients consumed by ``orders``.
+
+    Returns one unsaved ORDER movement per order and recipe ingredient,
+    with a negative delta of the recipe quantity times the order quantity.
+    Reads all recipes in a single query.
+    """
+    recipes = {}
+    recipe_rows = RecipeItem.objects.filter(
+        menu_item_id__in={order.menu_item_id for order in orders}
+    ).values_list('menu_item_id', 'ingredient_id', 'quantity')
+    for menu_item_id, ingredient_id, quantity in recipe_rows:
+        recipes.setdefault(menu_item_id, []).append((ingredient_id, to_decimal(quantity)))
+
+    return [
+        StockMovement(
+            ingredient_id=ingredient_id,
+            delta=-quantity * order.quantity,
+            reason=StockMovementReason.ORDER,
+            order=order
+        )
+        for order in orders
+        for ingredient_id, quantity in recipes.get(order.menu_item_id, [])
+    ]
+
+
+def consume_stock(orders):
+    """
+    Deduct the ingredients for ``orders`` from stock and record the
+    movements in the ledger, in one transaction.
+
+    The orders may still be unsaved: foreign keys are checked at commit on
+    SQLite and PostgreSQL, so they can be inserted afterwards in the same
+    transaction.
+    """
+    movements = order_movements(orders)
+    demand = {}
+    for movement in movements:
+        demand[movement.ingredient_id] = demand.get(movement.ingredient_id, Decimal(0)) - movement.delta
+    with transaction.atomic():
+        deduct_stock(demand)
+        StockMovement.objects.bulk_create(movements)
+
+
+def deduct_stock(demand):
+    """
+    Atomically subtract ``demand`` (ingredient id -> quantity) from stock.
+
+    The deduction is a single conditional UPDATE: each row is only touched if
+    it still holds enough stock, so concurrent orders cannot oversell. If any
+    ingredient is short the whole deduction is rolled back and a
+    ValidationError is raised.
+    """
+    demand = {pk: quantity for pk, quantity in demand.items() if quantity > 0}
+    if not demand:
+        return
+
+    enough_stock = Q()
+    new_stock = []
+    for pk, quantity in demand.items():
+        enough_stock |= Q(pk=pk, stock_quantity__gte=quantity)
+        new_stock.append(When(pk=pk, then=F('stock_quantity') - quantity))
+
+    with transaction.atomic():
+        updated = Ingredient.objects.filter(enough_stock).update(
+            stock_quantity=Case(
+                *new_stock,
+                default=F('stock_quantity'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+        if updated != len(demand):
+            raise ValidationError("Insufficient ingredient stock")
+        consume_lots(demand)
+        bump_versions(Ingredient)
+        # Queryset updates bypass the model signals
+        MenuItem.objects.filter(
+            recipe_items__ingredient_id__in=list(demand)
+        ).refresh_servable_portions()
+        record_deductions(demand)
+
+
+def rebook_order_stock(order, menu_item_id, quantity):
+    """
+    Correct the stock of an order edited after it was placed.
+
+    ``menu_item_id`` and ``quantity`` are what the stock was deducted for.
+    The difference to the order's current demand is deducted (with the
+    same no-oversell check as a new order) or credited back, per
+    ingredient, and recorded as ORDER movements of the order. Call this
+    inside the transaction that saves the order.
+    """
+    placed = order_movements([Order(pk=order.pk, menu_item_id=menu_item_id, quantity=quantity)])
+    demand = {}
+    for movement in order_movements([order]):
+        demand[movement.ingredient_id] = demand.get(movement.ingredient_id, Decimal(0)) - movement.delta
+    for movement in placed:
+        demand[movement.ingredient_id] = demand.get(movement.ingredient_id, Decimal(0)) + movement.delta
+
+    with transaction.atomic():
+        deduct_stock(demand)
+        StockMovement.objects.bulk_create(
+            StockMovement(
+                ingredient_id=pk, 
+                delta=-quantity, 
+                reason=StockMovementReason.ORDER, 
+                order=order
+            )
+            for pk, quantity in demand.items()
+            if quantity > 0
+        )
+        credits = [
+            {
+                'ingredient': pk, 
+                'delta': -quantity, 
+                'reason': StockMovementReason.ORDER, 
+                'order': order
+            }
+            for pk, quantity in demand.items()
+            if quantity < 0
+        ]
+        if credits:
+            adjust_stock_levels(credits)
+
+
+def place_orders(order_lines):
+    """
+    Validate and create many orders with one stock deduction.
+
+    ``order_lines`` is a list of dicts holding ``menu_item`` (an id) plus any
+    other Order fields. Ingredient demand is summed across the whole batch
+    and checked once; the orders are inserted with ``bulk_create`` in the
+    same transaction, so either every order is placed or none is.
+    """
+    menu_items = MenuItem.objects.in_bulk({line['menu_item'] for line in order_lines})
+
+    errors = []
+    orders = []
+    for index, line in enumerate(order_lines):
+        fields = dict(line)
+        menu_item = menu_items.get(fields.pop('menu_item'))
+        if menu_item is None:
+            errors.append(f"Order {index}: menu item does not exist")
+            continue
+        if not menu_item.is_available:
+            errors.append(f"Order {index}: menu item is not available")
+            continue
+        orders.append(Order(menu_item=menu_item, **fields))
+    if errors:
+        raise ValidationError(errors)
+
+    with transaction.atomic():
+        consume_stock(orders)
+        bump_versions(Order)
+        orders = Order.objects.bulk_create(orders)
+        # bulk_create sends no post_save
+        index_objects(Order, pk__in=[order.pk for order in orders])
+        return orders
+
+
+def adjust_stock_levels(adjustments):
+    """
+    Apply many stock adjustments in one transaction.
+
+    ``adjustments`` is a list of dicts holding ``ingredient`` (an id) and
+    either ``delta`` (added to the current stock) or ``count`` (the new
+    absolute stock, e.g. from a stocktake), optionally with the ``reason``
+    (and ``order``) to record in the ledger. Rows for the same ingredient
+    apply in order. The affected ingredients are locked, every result is
+    checked against the field validators, and the new levels are written
+    with a single ``bulk_update``; any invalid row rejects the whole batch
+    with a ValidationError whose ``message_dict`` maps the index of every
+    invalid row to its messages. Returns the updated ingredients.
+    """
+    stock_field = Ingredient._meta.get_field('stock_quantity')
+
+    with transaction.atomic():
+        ingredients = (
+            Ingredient.objects
+            .select_related('supplier')
+            .select_for_update(of=('self',))
+            # Lock in primary key order so concurrent batches cannot deadlock
+            .order_by('pk')
+            .in_bulk({adjustment['ingredient'] for adjustment in adjustments})
+        )
+        previous = {pk: ingredient.stock_quantity for pk, ingredient in ingredients.items()}
+
+        errors = {}
+        movements = []
+        for index, adjustment in enumerate(adjustments):
+            ingredient = ingredients.get(adjustment['ingredient'])
+            if ingredient is None:
+                errors[index] = ["Ingredient does not exist"]
+                continue
+            if 'count' in adjustment:
+                stock = to_decimal(adjustment['count'])
+                reason = StockMovementReason.STOCKTAKE
+            else:
+                stock = ingredient.stock_quantity + to_decimal(adjustment['delta'])
+                reason = StockMovementReason.ADJUSTMENT
+            reason = adjustment.get('reason', reason)
+            try:
+                stock_field.run_validators(stock)
+            except ValidationError as exc:
+                errors[index] = exc.messages
+                continue
+            if stock != ingredient.stock_quantity:
+                movements.append(StockMovement(
+                    ingredient=ingredient,
+                    delta=stock - ingredient.stock_quantity,
+                    reason=reason,
+                    order=adjustment.get('order')
+                ))
+            ingredient.stock_quantity = stock
+        if errors:
+            raise ValidationError(errors)
+
+        changed = [
+            ingredient for pk, ingredient in ingredients.items()
+            if ingredient.stock_quantity != previous[pk]
+        ]
+        Ingredient.objects.bulk_update(changed, ['stock_quantity'], batch_size=500)
+        StockMovement.objects.bulk_create(movements)
+        # Stock that is counted or written off comes out of the lots first
+        consume_lots({
+            ingredient.pk: previous[ingredient.pk] - ingredient.stock_quantity
+            for ingredient in changed
+        })
+
+        # bulk_update bypasses the model signals
+        record_stock_changes(
+            (ingredient.pk, previous[ingredient.pk], ingredient.stock_quantity, ingredient.minimum_stock_level)
+            for ingredient in changed
+        )
+        for ingredient in changed:
+            ingredient._loaded_stock_quantity = ingredient.stock_quantity
+        if changed:
+            menu_items = MenuItem.objects.filter(recipe_items__ingredient__in=changed)
+            invalidate_menu_items(menu_items.values_list('pk', flat=True))
+            menu_items.refresh_servable_portions()
+            bump_versions(Ingredient)
+    return list(ingredients.values())
+
+
+def consume_lots(demand):
+    """
+    Take ``demand`` (ingredient id -> quantity) out of the open lots of each
+    ingredient in consumption order, with one read and one ``bulk_update``.
+
+    Demand beyond what the lots hold comes out of stock that predates lot
+    tracking. Call this inside the transaction that deducts the stock.
+    """
+    remaining = {pk: quantity for pk, quantity in demand.items() if quantity > 0}
+    if not remaining:
+        return
+
+    lots = (
+        IngredientLot.objects
+        .open()
+        .filter(ingredient_id__in=list(remaining))
+        .in_consumption_order()
+        .select_for_update()
+    )
+    changed = []
+    for lot in lots:
+        needed = remaining[lot.ingredient_id]
+        if not needed:
+            continue
+        taken = min(needed, lot.quantity)
+        lot.quantity -= taken
+        remaining[lot.ingredient_id] = needed - taken
+        changed.append(lot)
+    IngredientLot.objects.bulk_update(changed, ['quantity'], batch_size=500)
+
+    exhausted = {lot.ingredient_id for lot in changed if not lot.quantity}
+    if exhausted:
+        refresh_lot_expiry(exhausted)
+
+
+def refresh_lot_expiry(ingredient_ids):
+    """
+    Set ``expiry_date`` of the ingredients to the earliest expiry among
+    their open lots, so the ingredient reads as expired as soon as any
+    stock on hand is. Stock that predates lot tracking is booked as a lot
+    by ``receive_lots``, so the lots cover it too; when no dated lot is
+    left the date is cleared.
+    """
+    earliest = (
+        IngredientLot.objects
+        .open()
+        .filter(ingredient=OuterRef('pk'), expiry_date__isnull=False)
+        .order_by('expiry_date')
+        .values('expiry_date')[:1]
+    )
+    updated = Ingredient.objects.filter(pk__in=list(ingredient_ids)).update(
+        expiry_date=Subquery(earliest)
+    )
+    if updated:
+        bump_versions(Ingredient)
+
+
+def book_untracked_stock(deliveries):
+    """
+    Turn the stock of the delivered ingredients that no open lot accounts
+    for (stock from before lot tracking, or added by hand) into an opening
+    lot carrying the ingredient's current expiry date, dated no later
+    than the deliveries so it counts as the oldest stock.
+    """
+    received = {}
+    for delivery in deliveries:
+        received_date = delivery.get('received_date') or timezone.localdate()
+        received[delivery['ingredient']] = min(
+            received_date, received.get(delivery['ingredient'], received_date)
+        )
+    untracked = (
+        Ingredient.objects
+        .filter(pk__in=list(received))
+        .annotate(
+            tracked=Coalesce(
+                Sum('lots__quantity', filter=Q(lots__quantity__gt=0)), 
+                Decimal('0'),
+                output_field=models.DecimalField()
+            ),
+            oldest_lot=Min('lots__received_date', filter=Q(lots__quantity__gt=0))
+        )
+        .filter(stock_quantity__gt=F('tracked'))
+        .values_list('pk', 'stock_quantity', 'tracked', 'expiry_date', 'oldest_lot')
+    )
+    IngredientLot.objects.bulk_create(
+        IngredientLot(
+            ingredient_id=pk,
+            quantity=stock - tracked,
+            received_quantity=stock - tracked,
+            expiry_date=expiry_date,
+            received_date=min(received[pk], oldest_lot or received[pk])
+        )
+        for pk, stock, tracked, expiry_date, oldest_lot in untracked
+    )
+
+
+def receive_lots(deliveries):
+    """
+    Book deliveries into stock.
+
+    ``deliveries`` is a list of dicts holding ``ingredient`` (an id),
+    ``quantity`` and optionally ``expiry_date`` and ``received_date``. Each
+    one becomes a lot and a RECEIPT movement, and the ingredient stock goes
+    up by the delivered quantity. Returns the created lots.
+    """
+    with transaction.atomic():
+        # Before the receipt raises the stock; keeps the expiry of older
+        # stock from being replaced by a later delivery date
+        book_untracked_stock(deliveries)
+        adjust_stock_levels([
+            {
+                'ingredient': delivery['ingredient'],
+                'delta': delivery['quantity'],
+                'reason': StockMovementReason.RECEIPT,
+            }
+            for delivery in deliveries
+        ])
+        lots = IngredientLot.objects.bulk_create(
+            IngredientLot(
+                ingredient_id=delivery['ingredient'],
+                quantity=delivery['quantity'],
+                received_quantity=delivery['quantity'],
+                expiry_date=delivery.get('expiry_date'),
+                received_date=delivery.get('received_date') or timezone.localdate()
+            )
+            for delivery in deliveries
+        )
+        refresh_lot_expiry({delivery['ingredient'] for delivery in deliveries})
+    return lots
@@ -1,8 +1,40 @@
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ValidationError
+from django.db import connection, connections, models
+from django.test.utils import CaptureQueriesContext
+from django.core.handlers.base import BaseHandler
+from django.core.management import CommandError, call_command
+import asyncio
+import json
+import os
+from io import StringIO
+import tempfile
+from decimal import Decimal
 import re
-from .models import Supplier, Ingredient, MenuItem, Order, RecipeItem
+from unittest import mock
+from .models import (
+    Supplier, Ingredient, MenuItem, Order, RecipeItem, SalesRollup, StockAlert,
+    StockMovement, StockMovementReason, OrderStatus, OrderConflict, IngredientLot
+)
+from .ledger import stock_at, take_snapshots
+from .forecast import reorder_plan
+from .reports import menu_engineering
+from .stock import adjust_stock_levels, place_orders, receive_lots
+from .alerts import record_expired
+from .feeds import ChangeFeed
+from .checks import check_response_cache, check_version_cache
+from .db_routers import PRIMARY_COOKIE, ReplicaRouter, read_alias
+from .sales import rebuild_sales_rollup
+from .metrics import MetricsRegistry, get_registry
+from . import bench
+from .replay import load_capture, replay
 from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache, caches
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from .serializers import SupplierSerializer, IngredientSerializer, MenuItemSerializer, OrderSerializer
 
 class SupplierModelTest(TestCase):
     def setUp(self):
@@ -121,3 +153,1630 @@ class OrderModelTest(TestCase):
         )
         with self.assertRaises(ValidationError):
             order.save()
+
+class OrderStockDeductionTest(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.flour = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=10, 
+            cost_per_unit=1.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.cheese = Ingredient.objects.create(
+            name="Cheese", 
+            supplier=self.supplier, 
+            stock_quantity=3, 
+            cost_per_unit=4.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Pizza", 
+            price=12.00,
+            preparation_time_minutes=15
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.flour, quantity=2)
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.cheese, quantity=0.5)
+
+    def test_save_deducts_stock_for_order_quantity(self):
+        Order.objects.create(menu_item=self.menu_item, quantity=3)
+        self.flour.refresh_from_db()
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.flour.stock_quantity, 4)
+        self.assertEqual(self.cheese.stock_quantity, 1.5)
+
+    def test_resave_does_not_deduct_again(self):
+        order = Order.objects.create(menu_item=self.menu_item, quantity=1)
+        order.status = 'PREP'
+        order.save()
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.stock_quantity, 8)
+
+    def test_insufficient_stock_rolls_back_whole_order(self):
+        # Flour would cover 5 portions but cheese only covers 6 -> 7 fails on both
+        with self.assertRaises(ValidationError):
+            Order.objects.create(menu_item=self.menu_item, quantity=7)
+        self.flour.refresh_from_db()
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.flour.stock_quantity, 10)
+        self.assertEqual(self.cheese.stock_quantity, 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_partial_shortage_leaves_other_ingredients_untouched(self):
+        self.flour.stock_quantity = 100
+        self.flour.save()
+        with self.assertRaises(ValidationError):
+            Order.objects.create(menu_item=self.menu_item, quantity=7)
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.stock_quantity, 100)
+
+class OrderBatchAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.flour = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=10, 
+            cost_per_unit=1.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.pizza = MenuItem.objects.create(
+            name="Pizza", 
+            price=12.00,
+            preparation_time_minutes=15
+        )
+        self.bread = MenuItem.objects.create(
+            name="Bread", 
+            price=4.00,
+            preparation_time_minutes=5
+        )
+        RecipeItem.objects.create(menu_item=self.pizza, ingredient=self.flour, quantity=2)
+        RecipeItem.objects.create(menu_item=self.bread, ingredient=self.flour, quantity=1)
+
+    def test_batch_creates_orders_and_deducts_combined_demand(self):
+        response = self.client.post('/api/orders/batch/', [
+            {'menu_item': str(self.pizza.id), 'quantity': 2},
+            {'menu_item': str(self.bread.id), 'quantity': 3, 'customer_name': 'Ann'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(Order.objects.count(), 2)
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.stock_quantity, 3)
+
+    def test_batch_is_rejected_as_a_whole_when_stock_is_short(self):
+        response = self.client.post('/api/orders/batch/', [
+            {'menu_item': str(self.pizza.id), 'quantity': 4},
+            {'menu_item': str(self.bread.id), 'quantity': 3},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.stock_quantity, 10)
+
+class MenuItemAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        for index in range(5):
+            ingredient = Ingredient.objects.create(
+                name=f"Ingredient {index}", 
+                supplier=self.supplier, 
+                stock_quantity=10, 
+                cost_per_unit=2.50,
+                expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+            )
+            menu_item = MenuItem.objects.create(
+                name=f"Menu Item {index}", 
+                price=15.00,
+                preparation_time_minutes=15
+            )
+            # The last menu item needs more than is in stock
+            RecipeItem.objects.create(
+                menu_item=menu_item, 
+                ingredient=ingredient, 
+                quantity=20 if index == 4 else 2
+            )
+
+    def test_list_matches_model_methods(self):
+        response = self.client.get('/api/menu-items/')
+        self.assertEqual(response.status_code, 200)
+        for row in response.data['results']:
+            menu_item = MenuItem.objects.get(pk=row['id'])
+            self.assertEqual(row['ingredient_cost'], menu_item.calculate_ingredient_cost())
+            self.assertEqual(
+                row['ingredient_availability'], 
+                menu_item.check_ingredient_availability()
+            )
+
+    def test_list_query_count_does_not_grow_with_items(self):
+        # count + page + recipe prefetch + one stats query for the cache misses
+        with self.assertNumQueries(4):
+            self.client.get('/api/menu-items/')
+        # Stats are now cached
+        with self.assertNumQueries(3):
+            self.client.get('/api/menu-items/')
+
+    def test_stock_change_invalidates_cached_availability(self):
+        menu_item = MenuItem.objects.get(name="Menu Item 4")
+        self.client.get(f'/api/menu-items/{menu_item.id}/')
+        
+        ingredient = Ingredient.objects.get(name="Ingredient 4")
+        ingredient.stock_quantity = 50
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        
+        response = self.client.get(f'/api/menu-items/{menu_item.id}/')
+        self.assertTrue(response.data['ingredient_availability'])
+
+    def test_order_invalidates_cached_availability(self):
+        menu_item = MenuItem.objects.get(name="Menu Item 0")
+        response = self.client.get(f'/api/menu-items/{menu_item.id}/')
+        self.assertTrue(response.data['ingredient_availability'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(menu_item=menu_item, quantity=5)
+        
+        response = self.client.get(f'/api/menu-items/{menu_item.id}/')
+        self.assertFalse(response.data['ingredient_availability'])
+
+class ExportAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.flour = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=10, 
+            unit="KG",
+            cost_per_unit=1.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        Ingredient.objects.create(
+            name="Milk", 
+            supplier=self.supplier, 
+            stock_quantity=5, 
+            unit="L",
+            cost_per_unit=1.20,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=3)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Bread", 
+            price=4.00,
+            preparation_time_minutes=5
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.flour, quantity=1)
+        Order.objects.create(menu_item=self.menu_item, quantity=2, customer_name="Ann")
+
+    def test_ingredient_csv_export_applies_filters(self):
+        response = self.client.get('/api/ingredients/export/', {'unit': 'KG'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'name'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Flour', lines[1])
+
+    def test_order_ndjson_export(self):
+        response = self.client.get('/api/orders/export/', {'export_format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        rows = [
+            json.loads(line) 
+            for line in b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['menu_item_name'], 'Bread')
+        self.assertEqual(Decimal(rows[0]['total_price']), 8)
+
+    def test_invalid_export_format(self):
+        response = self.client.get('/api/orders/export/', {'export_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+class OrderPaginationAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.menu_item = MenuItem.objects.create(
+            name="Water", 
+            price=1.00,
+            preparation_time_minutes=1
+        )
+        for index in range(15):
+            Order.objects.create(menu_item=self.menu_item, customer_name=f"Guest {index}")
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get('/api/orders/')
+        self.assertEqual(response.data['count'], 15)
+
+    def test_cursor_pagination_walks_every_order_once(self):
+        response = self.client.get('/api/orders/', {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        seen = [row['id'] for row in response.data['results']]
+        
+        response = self.client.get(response.data['next'])
+        seen += [row['id'] for row in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(len(set(seen)), 15)
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.soup = MenuItem.objects.create(
+            name="Soup", 
+            price=5.00,
+            category="APP",
+            preparation_time_minutes=5
+        )
+        self.steak = MenuItem.objects.create(
+            name="Steak", 
+            price=20.00,
+            preparation_time_minutes=20
+        )
+
+    def complete(self, order):
+        order.status = 'COMP'
+        order.save()
+
+    def test_rollup_follows_completed_transitions(self):
+        order = Order.objects.create(menu_item=self.soup, quantity=2)
+        self.assertFalse(SalesRollup.objects.exists())
+        
+        self.complete(order)
+        rollup = SalesRollup.objects.get(menu_item=self.soup)
+        self.assertEqual((rollup.quantity, rollup.revenue), (2, 10))
+        
+        # Saving again without a transition changes nothing
+        order.save()
+        order.status = 'CANC'
+        order.save()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.quantity, rollup.revenue), (0, 0))
+
+    def test_daily_sales_and_rebuild_agree(self):
+        self.complete(Order.objects.create(menu_item=self.soup, quantity=2))
+        self.complete(Order.objects.create(menu_item=self.steak, quantity=1))
+        Order.objects.create(menu_item=self.steak, quantity=5)
+        
+        response = self.client.get('/api/orders/daily_sales/')
+        self.assertEqual(response.data['daily_sales'], 30)
+        
+        SalesRollup.objects.update(quantity=0, revenue=0)
+        self.assertEqual(rebuild_sales_rollup(), 2)
+        response = self.client.get('/api/orders/daily_sales/')
+        self.assertEqual(response.data['daily_sales'], 30)
+
+    def test_edits_of_completed_orders_keep_the_rollup_in_sync(self):
+        def rollups():
+            return sorted(SalesRollup.objects.values_list('menu_item__name', 'quantity', 'revenue'))
+
+        order = Order.objects.create(menu_item=self.soup, quantity=2)
+        self.complete(order)
+        response = self.client.patch(f'/api/orders/{order.id}/', {'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(rollups(), [("Soup", 3, 15)])
+
+        self.client.patch(f'/api/orders/{order.id}/', {'menu_item': str(self.steak.id)}, format='json')
+        self.assertEqual(rollups(), [("Soup", 0, 0), ("Steak", 3, 60)])
+
+        self.steak.price = Decimal('25.00')
+        self.steak.save()
+        self.assertEqual(rollups(), [("Soup", 0, 0), ("Steak", 3, 75)])
+
+        expected = [row for row in rollups() if row[1]]
+        rebuild_sales_rollup()
+        self.assertEqual(rollups(), expected)
+
+    def test_sales_grouped_by_category(self):
+        self.complete(Order.objects.create(menu_item=self.soup, quantity=2))
+        self.complete(Order.objects.create(menu_item=self.steak, quantity=1))
+        
+        response = self.client.get('/api/orders/sales/', {'group_by': 'category'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['category'], row['quantity'], row['revenue']) for row in response.data['results']],
+            [('APP', 2, 10), ('MAIN', 1, 20)]
+        )
+
+    def test_sales_rejects_unparseable_dates(self):
+        for params in ({'start': 'last week'}, {'end': '2024-02-30'}):
+            response = self.client.get('/api/orders/sales/', params)
+            self.assertEqual(response.status_code, 400)
+        # An empty parameter means the default
+        response = self.client.get('/api/orders/sales/', {'start': ''})
+        self.assertEqual(response.data['start'], timezone.localdate())
+
+class MetricsTest(TestCase):
+    def test_metrics_are_labelled_by_viewset_action(self):
+        client = APIClient()
+        menu_item = MenuItem.objects.create(
+            name="Water", 
+            price=1.00,
+            preparation_time_minutes=1
+        )
+        client.get(f'/api/menu-items/{menu_item.id}/')
+        
+        body = client.get('/metrics').content.decode()
+        self.assertIn(
+            'http_requests_total{route="MenuItemViewSet.retrieve",method="GET",status="200"}', 
+            body
+        )
+        self.assertIn('http_request_duration_seconds_bucket{route="MenuItemViewSet.retrieve"', body)
+        self.assertNotIn(str(menu_item.id), body)
+
+    def test_file_backed_registries_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            registry = MetricsRegistry(directory=directory)
+            registry.request_started('GET')
+            registry.request_finished('OrderViewSet.list', 'GET', 200, 2_000_000)
+            
+            # Snapshot left behind by another worker process
+            with open(os.path.join(directory, f"metrics-{os.getppid()}.json"), 'w') as handle:
+                json.dump(registry.snapshot(), handle)
+            
+            body = registry.render()
+        self.assertIn(
+            'http_requests_total{route="OrderViewSet.list",method="GET",status="200"} 2', 
+            body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="OrderViewSet.list",method="GET",le="0.005"} 2', 
+            body
+        )
+
+    def test_concurrent_flushes_never_fail_requests(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with tempfile.TemporaryDirectory() as directory:
+            registry = MetricsRegistry(directory=directory, flush_interval=0)
+
+            def serve(_):
+                registry.request_started('GET')
+                registry.request_finished('OrderViewSet.list', 'GET', 200, 1_000_000)
+                registry.collect()
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(serve, range(200)))
+            self.assertEqual(os.listdir(directory), [f"metrics-{os.getpid()}.json"])
+            with open(os.path.join(directory, f"metrics-{os.getpid()}.json")) as handle:
+                self.assertEqual(json.load(handle)['requests'][0][-1], 200)
+
+            # A directory that went away is logged, not raised
+            with self.assertLogs('inventory.metrics', 'ERROR'):
+                registry.directory = os.path.join(directory, 'missing')
+                registry.request_started('GET')
+                registry.request_finished('OrderViewSet.list', 'GET', 200, 1_000_000)
+
+class BenchTest(TestCase):
+    def test_bench_covers_every_route(self):
+        from restaurant_inventory.urls import router
+
+        bench.seed(suppliers=2, ingredients=5, menu_items=3, recipe_size=2, orders=20, days=3)
+        results = bench.run(bench.endpoint_requests(router), iterations=1)
+        
+        for _, viewset, _ in router.registry:
+            self.assertIn(f"GET {viewset.__name__}.list", results)
+            for extra in viewset.get_extra_actions():
+                self.assertTrue(any(
+                    key.endswith(f"{viewset.__name__}.{extra.__name__}") for key in results
+                ))
+        self.assertGreater(results["GET OrderViewSet.list"]['queries'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'GET OrderViewSet.list': {'p95_ms': 10, 'queries': 2, 'errors': 0}}
+        current = {'GET OrderViewSet.list': {'p95_ms': 11, 'queries': 3, 'errors': 0}}
+        self.assertEqual(
+            bench.compare(current, baseline, tolerance=0.25), 
+            ['GET OrderViewSet.list: queries 2 -> 3']
+        )
+
+class CaptureReplayTest(TransactionTestCase):
+    def test_captured_requests_can_be_replayed(self):
+        menu_item = MenuItem.objects.create(
+            name="Water", 
+            price=1.00,
+            preparation_time_minutes=1
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            capture_file = os.path.join(directory, 'capture.jsonl')
+            with override_settings(REQUEST_CAPTURE_FILE=capture_file):
+                client = APIClient()
+                client.get('/api/menu-items/', {'category': 'MAIN'})
+                client.post(
+                    '/api/orders/', 
+                    {'menu_item': str(menu_item.id), 'quantity': 2}, 
+                    format='json'
+                )
+                client.get('/api/orders/missing/')
+            entries = load_capture(capture_file)
+        
+        self.assertEqual([entry['route'] for entry in entries], [
+            'MenuItemViewSet.list', 'OrderViewSet.create', 'OrderViewSet.retrieve'
+        ])
+        self.assertEqual(entries[0]['query'], 'category=MAIN')
+        self.assertEqual(json.loads(entries[1]['body'])['quantity'], 2)
+        
+        report = replay(entries, concurrency=1, speedup=0, host='testserver')
+        self.assertEqual(report['requests'], 3)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(report['endpoints']['GET OrderViewSet.retrieve']['error_rate'], 1)
+        self.assertEqual(report['endpoints']['ALL']['errors'], 1)
+
+    def test_capture_skips_credentials(self):
+        with tempfile.TemporaryDirectory() as directory:
+            capture_file = os.path.join(directory, 'capture.jsonl')
+            with override_settings(REQUEST_CAPTURE_FILE=capture_file):
+                client = APIClient()
+                client.post('/admin/login/', {'username': 'admin', 'password': 'hunter2'})
+                client.post(
+                    '/api/suppliers/?token=abc', 
+                    {'name': "Acme", 'password': 'hunter2', 'contacts': [{'secret': 's'}]}, 
+                    format='json'
+                )
+                client.get('/api/suppliers/')
+            with open(capture_file) as handle:
+                self.assertNotIn('hunter2', handle.read())
+            entries = load_capture(capture_file)
+
+            self.assertEqual([entry['path'] for entry in entries], ['/api/suppliers/'] * 2)
+            self.assertEqual(json.loads(entries[0]['body']), {
+                'name': "Acme", 'password': '[REDACTED]', 'contacts': [{'secret': '[REDACTED]'}]
+            })
+            self.assertEqual(entries[0]['query'], 'token=%5BREDACTED%5D')
+
+            # Writes are not replayed against the configured database by default
+            with self.assertRaises(CommandError):
+                call_command('replay', capture_file, stdout=StringIO())
+            output = StringIO()
+            call_command('replay', capture_file, '--reads-only', '--host', 'testserver', 
+                         '--speedup', '0', stdout=output)
+            self.assertEqual(json.loads(output.getvalue())['requests'], 1)
+
+class ServablePortionsTest(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.flour = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=10, 
+            cost_per_unit=1.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.cheese = Ingredient.objects.create(
+            name="Cheese", 
+            supplier=self.supplier, 
+            stock_quantity=0.3, 
+            cost_per_unit=4.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Pizza", 
+            price=12.00,
+            preparation_time_minutes=15
+        )
+
+    def servable_portions(self):
+        self.menu_item.refresh_from_db()
+        return self.menu_item.servable_portions
+
+    def test_portions_follow_recipe_and_stock_changes(self):
+        self.assertIsNone(self.servable_portions())
+        
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.flour, quantity=2)
+        self.assertEqual(self.servable_portions(), 5)
+        
+        # 0.3 / 0.1 must not be floored to 2 by float rounding
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.cheese, quantity=0.1)
+        self.assertEqual(self.servable_portions(), 3)
+        
+        self.flour.stock_quantity = 3
+        self.flour.save()
+        self.assertEqual(self.servable_portions(), 1)
+
+    def test_orders_reduce_portions_and_availability(self):
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.flour, quantity=2)
+        Order.objects.create(menu_item=self.menu_item, quantity=4)
+        self.assertEqual(self.servable_portions(), 1)
+        self.assertTrue(self.menu_item.check_ingredient_availability())
+        self.assertFalse(self.menu_item.check_ingredient_availability(quantity=2))
+        
+        Order.objects.create(menu_item=self.menu_item, quantity=1)
+        response = APIClient().get('/api/menu-items/unavailable_items/')
+        self.assertEqual([row['name'] for row in response.data], ["Pizza"])
+
+class StockAlertTest(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.flour = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=20, 
+            minimum_stock_level=10,
+            cost_per_unit=1.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Bread", 
+            price=4.00,
+            preparation_time_minutes=5
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.flour, quantity=4)
+
+    def kinds(self):
+        return list(StockAlert.objects.order_by('id').values_list('kind', flat=True))
+
+    def test_alerts_only_on_threshold_crossings(self):
+        Order.objects.create(menu_item=self.menu_item, quantity=1)
+        self.assertEqual(self.kinds(), [])
+        
+        Order.objects.create(menu_item=self.menu_item, quantity=1)
+        Order.objects.create(menu_item=self.menu_item, quantity=1)
+        self.assertEqual(self.kinds(), ['LOW'])
+        
+        flour = Ingredient.objects.get(pk=self.flour.pk)
+        flour.stock_quantity = 50
+        flour.save()
+        self.assertEqual(self.kinds(), ['LOW', 'OK'])
+
+    def test_expiry_alert_is_raised_once(self):
+        Ingredient.objects.filter(pk=self.flour.pk).update(
+            expiry_date=timezone.now().date() - timezone.timedelta(days=1)
+        )
+        self.assertEqual(len(record_expired()), 1)
+        self.assertEqual(len(record_expired()), 0)
+        self.assertEqual(self.kinds(), ['EXP'])
+
+    def test_stream_sends_alerts_after_event_id(self):
+        Order.objects.create(menu_item=self.menu_item, quantity=3)
+        alert = StockAlert.objects.get()
+        
+        async def first_event():
+            response = await AsyncClient().get('/api/stock-alerts/stream/', {'after': 0})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            return await anext(aiter(response.streaming_content))
+        
+        event = async_to_sync(first_event)().decode()
+        self.assertTrue(event.startswith(f"id: {alert.id}\nevent: LOW\n"))
+
+    def test_stream_requires_asgi(self):
+        response = APIClient().get('/api/stock-alerts/stream/')
+        self.assertEqual(response.status_code, 501)
+
+class AsyncReadViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(name="Test Supplier", email="a@example.com")
+        for index in range(12):
+            ingredient = Ingredient.objects.create(
+                name=f"Ingredient {index}", 
+                supplier=self.supplier, 
+                stock_quantity=10 + index, 
+                unit="KG" if index % 2 else "G",
+                cost_per_unit=2.50,
+                expiry_date=timezone.now().date() + timezone.timedelta(days=index - 3)
+            )
+            menu_item = MenuItem.objects.create(
+                name=f"Menu Item {index}", 
+                price=15.00,
+                preparation_time_minutes=15
+            )
+            RecipeItem.objects.create(menu_item=menu_item, ingredient=ingredient, quantity=2)
+            Order.objects.create(menu_item=menu_item, quantity=1)
+
+    def assertSameResponse(self, sync_path, async_path, params=None):
+        expected = APIClient().get(sync_path, params, HTTP_ACCEPT='application/json')
+        
+        async def fetch():
+            return await AsyncClient().get(async_path, params)
+        
+        response = async_to_sync(fetch)()
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(
+            response.content.replace(b'/api/async/', b'/api/'), 
+            expected.content
+        )
+
+    def test_lists_match_sync_endpoints(self):
+        self.assertSameResponse('/api/suppliers/', '/api/async/suppliers/')
+        self.assertSameResponse('/api/ingredients/', '/api/async/ingredients/', {'page': 2})
+        self.assertSameResponse(
+            '/api/ingredients/', '/api/async/ingredients/', 
+            {'unit': 'KG', 'ordering': '-stock_quantity', 'search': 'Ingredient'}
+        )
+        self.assertSameResponse(
+            '/api/ingredients/', '/api/async/ingredients/', {'supplier': str(self.supplier.id)}
+        )
+        self.assertSameResponse('/api/menu-items/', '/api/async/menu-items/', {'ordering': 'price'})
+        self.assertSameResponse('/api/orders/pending_orders/', '/api/async/orders/pending/')
+
+    def test_retrieve_and_errors_match_sync_endpoints(self):
+        menu_item = MenuItem.objects.first()
+        self.assertSameResponse(
+            f'/api/menu-items/{menu_item.id}/', f'/api/async/menu-items/{menu_item.id}/'
+        )
+        self.assertSameResponse('/api/suppliers/missing/', '/api/async/suppliers/missing/')
+        self.assertSameResponse('/api/ingredients/', '/api/async/ingredients/', {'page': 9})
+        self.assertSameResponse('/api/ingredients/', '/api/async/ingredients/', {'supplier': 'nope'})
+
+
+    @override_settings(DEBUG=True)
+    def test_async_reads_are_not_adapted_to_sync(self):
+        # A sync middleware would put every async read back on a thread
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            response = async_to_sync(AsyncClient().get)('/api/async/suppliers/')
+        self.assertEqual(response.status_code, 200)
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.ingredient = Ingredient.objects.create(
+            name="Tomato", 
+            supplier=self.supplier, 
+            stock_quantity=10, 
+            cost_per_unit=2.50,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Salad", 
+            price=15.00,
+            preparation_time_minutes=15
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.ingredient, quantity=2)
+
+    def test_unchanged_list_returns_304_without_queries(self):
+        response = self.client.get('/api/menu-items/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(
+            f'/api/menu-items/{self.menu_item.id}/', 
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get('/api/menu-items/')['ETag']
+        response = self.client.get('/api/menu-items/?ordering=price', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_writes_change_etag_of_dependent_endpoints(self):
+        menu_etag = self.client.get('/api/menu-items/')['ETag']
+        supplier_etag = self.client.get('/api/suppliers/')['ETag']
+
+        # Stock deductions are queryset updates, not model saves
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(menu_item=self.menu_item, quantity=1)
+
+        response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=menu_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['servable_portions'], 4)
+        response = self.client.get('/api/suppliers/', HTTP_IF_NONE_MATCH=supplier_etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/suppliers/{self.supplier.id}/', {'rating': 2.5}, format='json'
+            )
+        response = self.client.get('/api/suppliers/', HTTP_IF_NONE_MATCH=supplier_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_per_process_version_cache_is_flagged(self):
+        self.assertEqual(check_version_cache(None), [])
+        with override_settings(MODEL_VERSION_CACHE_ALIAS='default'):
+            self.assertEqual([w.id for w in check_version_cache(None)], ['inventory.W001'])
+
+@override_settings(RESPONSE_CACHE_ALIAS='responses')
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Test Supplier", email="a@example.com", rating=2.0)
+        Supplier.objects.create(name="Other Supplier", email="b@example.com", rating=4.5)
+
+    def cache_counts(self, route):
+        counts = {result: value for name, result, value in get_registry().snapshot()['cache'] if name == route}
+        return counts.get('hit', 0), counts.get('miss', 0)
+
+    def test_equivalent_queries_share_an_entry(self):
+        hits, misses = self.cache_counts('SupplierViewSet.list')
+        first = self.client.get('/api/suppliers/?is_active=true&ordering=name&search=')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/suppliers/?ordering=name&is_active=true')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.cache_counts('SupplierViewSet.list'), (hits + 1, misses + 1))
+
+    def test_write_invalidates_dependent_entries(self):
+        response = self.client.get('/api/suppliers/low_rating_suppliers/')
+        self.assertEqual(len(response.data), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/suppliers/{self.supplier.id}/', {'rating': 4.0}, format='json')
+        response = self.client.get('/api/suppliers/low_rating_suppliers/')
+        self.assertEqual(response.data, [])
+
+    @override_settings(RESPONSE_CACHE_ALIAS='responses-file')
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={
+                **settings.CACHES,
+                'responses-file': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory,
+                },
+            }):
+                first = self.client.get(f'/api/suppliers/{self.supplier.id}/')
+                with self.assertNumQueries(0):
+                    second = self.client.get(f'/api/suppliers/{self.supplier.id}/')
+                self.assertEqual(second.content, first.content)
+                self.assertTrue(os.listdir(directory))
+
+
+    def test_shared_responses_need_shared_versions(self):
+        self.assertEqual(check_response_cache(None), [])
+        with override_settings(RESPONSE_CACHE_ALIAS='responses-file', MODEL_VERSION_CACHE_ALIAS='default'):
+            self.assertEqual([e.id for e in check_response_cache(None)], ['inventory.E001'])
+        # Per-process responses may use per-process versions
+        with override_settings(MODEL_VERSION_CACHE_ALIAS='default'):
+            self.assertEqual(check_response_cache(None), [])
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.ingredient = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=100, 
+            cost_per_unit=1.00,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Bread", 
+            price=5.00,
+            preparation_time_minutes=30
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.ingredient, quantity=2.5)
+
+    def test_stock_changes_are_recorded(self):
+        order = Order.objects.create(menu_item=self.menu_item, quantity=2)
+        ingredient = Ingredient.objects.get(pk=self.ingredient.pk)
+        ingredient.stock_quantity = Decimal('120')
+        ingredient.save()
+
+        movements = list(
+            StockMovement.objects.filter(ingredient=ingredient)
+            .order_by('id').values_list('reason', 'delta', 'order')
+        )
+        self.assertEqual(movements, [
+            (StockMovementReason.INITIAL, Decimal('100'), None),
+            (StockMovementReason.ORDER, Decimal('-5'), order.pk),
+            (StockMovementReason.ADJUSTMENT, Decimal('25'), None),
+        ])
+        self.assertEqual(sum(delta for _, delta, _ in movements), ingredient.stock_quantity)
+
+    def test_batch_orders_write_movements_in_bulk(self):
+        lines = [{'menu_item': self.menu_item.pk, 'quantity': 1}] * 4
+        with CaptureQueriesContext(connection) as queries:
+            orders = place_orders(lines)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "inventory_stockmovement"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            StockMovement.objects.filter(reason=StockMovementReason.ORDER, order__in=orders).count(), 
+            4
+        )
+
+    def test_order_edits_rebook_stock(self):
+        client = APIClient()
+        water = Ingredient.objects.create(
+            name="Water", supplier=self.supplier, stock_quantity=10, cost_per_unit=0.10,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        soup = MenuItem.objects.create(name="Soup", price=4.00, preparation_time_minutes=5)
+        RecipeItem.objects.create(menu_item=soup, ingredient=water, quantity=1)
+        order = Order.objects.create(menu_item=self.menu_item, quantity=2)
+
+        def stock():
+            return [
+                Ingredient.objects.get(pk=pk).stock_quantity for pk in (self.ingredient.pk, water.pk)
+            ]
+
+        response = client.patch(f'/api/orders/{order.id}/', {'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stock(), [Decimal('90'), Decimal('10')])
+        self.menu_item.refresh_from_db()
+        self.assertEqual(self.menu_item.servable_portions, 36)
+
+        # Never oversold: the whole edit is refused
+        response = client.patch(f'/api/orders/{order.id}/', {'quantity': 100}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(stock(), [Decimal('90'), Decimal('10')])
+
+        # Another dish: the flour comes back, the water goes
+        response = client.patch(
+            f'/api/orders/{order.id}/', {'menu_item': str(soup.id)}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stock(), [Decimal('100'), Decimal('6')])
+        self.assertEqual(
+            StockMovement.objects.filter(order=order, ingredient=self.ingredient)
+            .aggregate(total=models.Sum('delta'))['total'],
+            0
+        )
+
+    def test_stock_at_point_in_time(self):
+        created = timezone.now()
+        Order.objects.create(menu_item=self.menu_item, quantity=2)
+        after_first = timezone.now()
+        take_snapshots(after_first)
+        Order.objects.create(menu_item=self.menu_item, quantity=4)
+
+        self.assertEqual(stock_at(self.ingredient, created), Decimal('100'))
+        self.assertEqual(stock_at(self.ingredient, after_first), Decimal('95'))
+        self.assertEqual(stock_at(self.ingredient, timezone.now()), Decimal('85'))
+        self.assertEqual(stock_at(self.ingredient, created - timezone.timedelta(days=1)), Decimal('0'))
+
+        # Later reads start at the snapshot, even if older movements vanish
+        StockMovement.objects.filter(created_at__lte=after_first).delete()
+        self.assertEqual(stock_at(self.ingredient, timezone.now()), Decimal('85'))
+
+    def test_snapshots_leave_room_for_late_commits(self):
+        stamped = timezone.now()
+        snapshot, = take_snapshots()
+        self.assertLess(snapshot.taken_at, stamped)
+        # Stamped before the snapshot was taken, committed after it
+        StockMovement.objects.create(
+            ingredient=self.ingredient, delta=-3, reason=StockMovementReason.ADJUSTMENT, created_at=stamped
+        )
+        self.assertEqual(stock_at(self.ingredient, timezone.now()), Decimal('97'))
+
+    def test_stock_at_endpoint(self):
+        client = APIClient()
+        at = timezone.now()
+        Order.objects.create(menu_item=self.menu_item, quantity=2)
+        response = client.get(
+            f'/api/ingredients/{self.ingredient.id}/stock_at/', {'at': at.isoformat()}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], '100.00')
+        response = client.get(f'/api/ingredients/{self.ingredient.id}/stock_at/', {'at': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+        response = client.get('/api/stock-movements/', {'reason': StockMovementReason.ORDER})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['delta'], '-5.00')
+
+
+class BulkAdjustAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ingredient {index}", 
+                supplier=self.supplier, 
+                stock_quantity=20, 
+                minimum_stock_level=10,
+                cost_per_unit=2.50,
+                expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+            )
+            for index in range(3)
+        ]
+        self.menu_item = MenuItem.objects.create(
+            name="Soup", 
+            price=8.00,
+            preparation_time_minutes=10
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.ingredients[0], quantity=2)
+
+    def test_deltas_and_counts_in_one_update(self):
+        payload = [
+            {'ingredient': str(self.ingredients[0].id), 'delta': '-15.5'},
+            {'ingredient': str(self.ingredients[1].id), 'count': '42'},
+            {'ingredient': str(self.ingredients[2].id), 'count': '20'},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/ingredients/bulk_adjust/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "inventory_ingredient"')]
+        self.assertEqual(len(updates), 1)
+
+        stock = dict(Ingredient.objects.values_list('name', 'stock_quantity'))
+        self.assertEqual(stock, {
+            'Ingredient 0': Decimal('4.50'), 
+            'Ingredient 1': Decimal('42'), 
+            'Ingredient 2': Decimal('20'),
+        })
+        self.assertEqual(
+            set(StockMovement.objects.exclude(reason=StockMovementReason.INITIAL).values_list('reason', 'delta')),
+            {(StockMovementReason.ADJUSTMENT, Decimal('-15.5')), (StockMovementReason.STOCKTAKE, Decimal('22'))}
+        )
+        self.assertTrue(StockAlert.objects.filter(ingredient=self.ingredients[0], kind='LOW').exists())
+        self.menu_item.refresh_from_db()
+        self.assertEqual(self.menu_item.servable_portions, 2)
+
+    def test_invalid_rows_reject_the_batch(self):
+        payload = [
+            {'ingredient': str(self.ingredients[0].id), 'delta': '5'},
+            {'ingredient': str(self.ingredients[1].id), 'delta': '-25'},
+            {'ingredient': str(self.ingredients[2].id), 'count': '1', 'delta': '1'},
+        ]
+        response = self.client.post('/api/ingredients/bulk_adjust/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['details'][0], {})
+        self.assertIn('non_field_errors', response.data['details'][2])
+
+        # Stock errors come back in the same per-row shape
+        payload[2] = {'ingredient': str(self.supplier.id), 'delta': '1'}
+        response = self.client.post('/api/ingredients/bulk_adjust/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['details'][0], {})
+        self.assertEqual(len(response.data['details'][1]['non_field_errors']), 1)
+        self.assertEqual(
+            response.data['details'][2], {'non_field_errors': ['Ingredient does not exist']}
+        )
+        self.assertEqual(Ingredient.objects.get(pk=self.ingredients[0].pk).stock_quantity, 20)
+
+    def test_adjust_stock_keeps_decimal_precision(self):
+        response = self.client.post(
+            f'/api/ingredients/{self.ingredients[0].id}/adjust_stock/', 
+            {'quantity': '0.1'}, 
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], '20.10')
+        response = self.client.post(
+            f'/api/ingredients/{self.ingredients[0].id}/adjust_stock/', 
+            {'quantity': 'lots'}, 
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ValuesSerializerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        suppliers = [
+            Supplier.objects.create(name=f"Supplier {index}", email=f"s{index}@example.com", category="MEAT", rating=3.25)
+            for index in range(2)
+        ]
+        ingredients = []
+        for index in range(6):
+            ingredients.append(Ingredient.objects.create(
+                name=f"Ingredient {index}", 
+                supplier=suppliers[index % 2], 
+                stock_quantity=10 + index, 
+                minimum_stock_level=12,
+                unit="KG" if index % 2 else "L",
+                cost_per_unit=1.15,
+                expiry_date=None if index == 5 else timezone.now().date() + timezone.timedelta(days=index - 2)
+            ))
+        for index in range(4):
+            menu_item = MenuItem.objects.create(
+                name=f"Menu Item {index}", 
+                category="MAIN",
+                price=9.99,
+                preparation_time_minutes=15
+            )
+            for ingredient in ingredients[index:index + 3]:
+                RecipeItem.objects.create(menu_item=menu_item, ingredient=ingredient, quantity=0.5)
+            Order.objects.create(menu_item=menu_item, quantity=index + 1, customer_name="Ann", status="PEND")
+
+    def assertSameAsModelSerializer(self, path, serializer_class, queryset, params=None):
+        response = self.client.get(path, params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        rows = data['results'] if isinstance(data, dict) else data
+        objects = {str(obj.pk): obj for obj in queryset}
+        expected = serializer_class([objects[row['id']] for row in rows], many=True).data
+        self.assertEqual(
+            JSONRenderer().render(rows), 
+            JSONRenderer().render(expected)
+        )
+
+    def test_lists_match_model_serializers(self):
+        self.assertSameAsModelSerializer('/api/suppliers/', SupplierSerializer, Supplier.objects.all())
+        self.assertSameAsModelSerializer(
+            '/api/ingredients/', IngredientSerializer, Ingredient.objects.all(), {'ordering': 'stock_quantity'}
+        )
+        self.assertSameAsModelSerializer('/api/menu-items/', MenuItemSerializer, MenuItem.objects.all())
+        self.assertSameAsModelSerializer('/api/orders/', OrderSerializer, Order.objects.all())
+        self.assertSameAsModelSerializer(
+            '/api/orders/', OrderSerializer, Order.objects.all(), {'pagination': 'cursor'}
+        )
+        self.assertSameAsModelSerializer('/api/orders/pending_orders/', OrderSerializer, Order.objects.all())
+
+    def test_order_list_query_count_does_not_grow_with_rows(self):
+        # count + page with the menu item joined in
+        with self.assertNumQueries(2):
+            self.client.get('/api/orders/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/orders/pending_orders/')
+
+
+class ReorderPlanTest(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Test Supplier", email="a@example.com")
+        self.flour = Ingredient.objects.create(
+            name="Flour", 
+            supplier=self.supplier, 
+            stock_quantity=10, 
+            minimum_stock_level=5,
+            cost_per_unit=1.50,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.salt = Ingredient.objects.create(
+            name="Salt", 
+            supplier=self.supplier, 
+            stock_quantity=1000, 
+            minimum_stock_level=5,
+            cost_per_unit=0.10,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=300)
+        )
+        menu_item = MenuItem.objects.create(
+            name="Bread", 
+            price=5.00,
+            preparation_time_minutes=30
+        )
+        RecipeItem.objects.create(menu_item=menu_item, ingredient=self.flour, quantity=0.5)
+        RecipeItem.objects.create(menu_item=menu_item, ingredient=self.salt, quantity=0.01)
+
+        # Four portions (two units of flour) a day for four weeks, plus a
+        # cancelled order that must not count
+        now = timezone.now()
+        orders = Order.objects.bulk_create(
+            [Order(menu_item=menu_item, quantity=4) for _ in range(28)]
+            + [Order(menu_item=menu_item, quantity=100, status=OrderStatus.CANCELLED)]
+        )
+        for days_ago, order in enumerate(orders, start=1):
+            Order.objects.filter(pk=order.pk).update(order_date=now - timezone.timedelta(days=min(days_ago, 28)))
+
+    def test_plan_covers_forecast_and_minimum(self):
+        plan = reorder_plan(days=14, history_days=28)
+        self.assertEqual(len(plan['suppliers']), 1)
+        supplier = plan['suppliers'][0]
+        self.assertEqual(supplier['supplier_name'], "Test Supplier")
+        self.assertEqual([item['name'] for item in supplier['items']], ["Flour"])
+
+        item = supplier['items'][0]
+        self.assertEqual(item['forecast_quantity'], Decimal('28.00'))
+        # 28 forecast + 5 minimum - 10 in stock
+        self.assertEqual(item['suggested_quantity'], Decimal('23.00'))
+        self.assertEqual(item['estimated_cost'], Decimal('34.50'))
+        self.assertEqual(item['days_until_stockout'], 6)
+        self.assertEqual(plan['estimated_cost'], Decimal('34.50'))
+
+    def test_endpoint(self):
+        client = APIClient()
+        response = client.get('/api/ingredients/reorder_plan/', {'days': 7, 'history_days': 28})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suppliers'][0]['items'][0]['suggested_quantity'], Decimal('9.00'))
+
+        response = client.get('/api/ingredients/reorder_plan/', {'days': 7, 'supplier': str(self.supplier.id)})
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/ingredients/reorder_plan/', {'days': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MenuEngineeringTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        cheap = Ingredient.objects.create(
+            name="Cheap", supplier=self.supplier, stock_quantity=100, cost_per_unit=1,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        dear = Ingredient.objects.create(
+            name="Dear", supplier=self.supplier, stock_quantity=100, cost_per_unit=2,
+            expiry_date=timezone.now().date() + timezone.timedelta(days=30)
+        )
+        self.today = timezone.localdate()
+        for name, price, ingredient, units in [
+            ("A", 10, cheap, 50), ("B", 5, dear, 40), ("C", 20, cheap, 2), ("D", 4, None, 0)
+        ]:
+            menu_item = MenuItem.objects.create(name=name, price=price, preparation_time_minutes=5)
+            if ingredient:
+                RecipeItem.objects.create(menu_item=menu_item, ingredient=ingredient, quantity=2)
+            if units:
+                SalesRollup.objects.create(
+                    day=self.today, menu_item=menu_item, quantity=units, revenue=units * price
+                )
+                # Outside the reported range
+                SalesRollup.objects.create(
+                    day=self.today - timezone.timedelta(days=30), menu_item=menu_item, 
+                    quantity=1000, revenue=1000 * price
+                )
+
+    def test_report_in_one_query(self):
+        with self.assertNumQueries(1):
+            report = menu_engineering(start=self.today - timezone.timedelta(days=6), end=self.today)
+
+        self.assertEqual(report['units'], 92)
+        self.assertEqual(report['revenue'], Decimal('740'))
+        self.assertEqual(report['ingredient_cost'], Decimal('264'))
+        self.assertEqual(report['unit_margin_threshold'], Decimal('5.17'))
+        rows = {row['item_name']: row for row in report['results']}
+        self.assertEqual(rows['B']['ingredient_cost'], Decimal('160'))
+        self.assertEqual(rows['B']['margin'], Decimal('40'))
+        self.assertEqual(rows['B']['food_cost_percentage'], Decimal('80'))
+        self.assertIsNone(rows['D']['food_cost_percentage'])
+        self.assertEqual(
+            {name: row['quadrant'] for name, row in rows.items()},
+            {'A': 'star', 'B': 'plowhorse', 'C': 'puzzle', 'D': 'dog'}
+        )
+
+    def test_endpoint(self):
+        client = APIClient()
+        response = client.get('/api/menu-items/engineering/', {'start': self.today.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+        response = client.get('/api/menu-items/engineering/', {'start': '2024-13-01'})
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/api/menu-items/engineering/', {'end': 'today'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IngredientLotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.today = timezone.localdate()
+        self.supplier = Supplier.objects.create(name="Test Supplier")
+        # Five units predate lot tracking
+        self.ingredient = Ingredient.objects.create(
+            name="Milk", 
+            supplier=self.supplier, 
+            stock_quantity=5, 
+            cost_per_unit=1.00,
+            expiry_date=self.today + timezone.timedelta(days=30)
+        )
+        self.menu_item = MenuItem.objects.create(
+            name="Latte", 
+            price=4.00,
+            preparation_time_minutes=3
+        )
+        RecipeItem.objects.create(menu_item=self.menu_item, ingredient=self.ingredient, quantity=1)
+        self.late, self.early = receive_lots([
+            {'ingredient': self.ingredient.pk, 'quantity': Decimal('10'), 
+             'expiry_date': self.today + timezone.timedelta(days=10), 
+             'received_date': self.today - timezone.timedelta(days=2)},
+            {'ingredient': self.ingredient.pk, 'quantity': Decimal('4'), 
+             'expiry_date': self.today + timezone.timedelta(days=2)},
+        ])
+
+    def lot_quantities(self):
+        return [
+            IngredientLot.objects.get(pk=lot.pk).quantity for lot in (self.early, self.late)
+        ]
+
+    def test_receipt_adds_stock_and_tracks_earliest_expiry(self):
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.stock_quantity, Decimal('19'))
+        self.assertEqual(self.ingredient.expiry_date, self.today + timezone.timedelta(days=2))
+        self.assertEqual(
+            StockMovement.objects.filter(reason=StockMovementReason.RECEIPT).count(), 2
+        )
+
+    def test_orders_consume_first_expiry_first(self):
+        place_orders([{'menu_item': self.menu_item.pk, 'quantity': 3}] * 2)
+        self.assertEqual(self.lot_quantities(), [Decimal('0'), Decimal('8')])
+        # The early lot is used up, so the ingredient now expires with the late one
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.expiry_date, self.today + timezone.timedelta(days=10))
+
+        # Then the stock from before lot tracking, booked as an opening lot
+        Order.objects.create(menu_item=self.menu_item, quantity=10)
+        self.assertEqual(self.lot_quantities(), [Decimal('0'), Decimal('0')])
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.stock_quantity, Decimal('3'))
+        self.assertEqual(self.ingredient.expiry_date, self.today + timezone.timedelta(days=30))
+
+    @override_settings(LOT_CONSUMPTION_ORDER='received')
+    def test_orders_consume_oldest_delivery_first(self):
+        # The five units from before lot tracking are the oldest
+        Order.objects.create(menu_item=self.menu_item, quantity=7)
+        self.assertEqual(self.lot_quantities(), [Decimal('4'), Decimal('8')])
+
+    def test_later_deliveries_keep_the_expiry_of_older_stock(self):
+        cream = Ingredient.objects.create(
+            name="Cream", 
+            supplier=self.supplier, 
+            stock_quantity=5, 
+            cost_per_unit=1.00,
+            expiry_date=self.today + timezone.timedelta(days=1)
+        )
+        lot, = receive_lots([{
+            'ingredient': cream.pk, 'quantity': Decimal('5'), 
+            'expiry_date': self.today + timezone.timedelta(days=10)
+        }])
+        cream.refresh_from_db()
+        self.assertEqual(cream.expiry_date, self.today + timezone.timedelta(days=1))
+
+        # Once the older stock is used up the delivery's date applies
+        adjust_stock_levels([{'ingredient': cream.pk, 'delta': Decimal('-5')}])
+        cream.refresh_from_db()
+        self.assertEqual(cream.expiry_date, lot.expiry_date)
+
+        # No lot left: no expiry to report
+        adjust_stock_levels([{'ingredient': cream.pk, 'delta': Decimal('-5')}])
+        cream.refresh_from_db()
+        self.assertIsNone(cream.expiry_date)
+
+    def test_stocktake_counts_come_out_of_lots(self):
+        adjust_stock_levels([{'ingredient': self.ingredient.pk, 'count': Decimal('13')}])
+        self.assertEqual(self.lot_quantities(), [Decimal('0'), Decimal('8')])
+
+    def test_expiring_soon_and_receive_endpoints(self):
+        response = self.client.post(
+            f'/api/ingredients/{self.ingredient.id}/receive/', 
+            {'quantity': '2.5', 'expiry_date': (self.today - timezone.timedelta(days=1)).isoformat()}, 
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['is_expired'])
+
+        response = self.client.get('/api/ingredient-lots/expiring_soon/', {'days': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.early.id])
+        self.assertFalse(response.data['results'][0]['is_expired'])
+
+        response = self.client.post(
+            f'/api/ingredients/{self.ingredient.id}/receive/', {'quantity': '0'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_manual_stock_edits_come_out_of_lots(self):
+        response = self.client.patch(
+            f'/api/ingredients/{self.ingredient.id}/', {'stock_quantity': '13'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lot_quantities(), [Decimal('0'), Decimal('8')])
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.expiry_date, self.today + timezone.timedelta(days=10))
+
+        # Raising the stock leaves the lots alone
+        self.ingredient.stock_quantity = Decimal('20')
+        self.ingredient.save()
+        self.assertEqual(self.lot_quantities(), [Decimal('0'), Decimal('8')])
+
+    def test_lot_status_follows_the_current_date(self):
+        def early_lot_expired():
+            response = self.client.get(f'/api/ingredient-lots/{self.early.id}/')
+            return response.data['is_expired']
+
+        self.assertFalse(early_lot_expired())
+        # Three days on, the lot is past its expiry without a restart
+        later = timezone.now() + timezone.timedelta(days=3)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertTrue(early_lot_expired())
+
+class OrderStateMachineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.menu_item = MenuItem.objects.create(
+            name="Soup", 
+            price=5.00,
+            preparation_time_minutes=5
+        )
+        self.order = Order.objects.create(menu_item=self.menu_item, quantity=2)
+
+    def update_status(self, new_status, **data):
+        return self.client.post(
+            f'/api/orders/{self.order.id}/update_status/', 
+            {'status': new_status, **data}, 
+            format='json'
+        )
+
+    def test_transitions_bump_version_and_write_only_status(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.update_status(OrderStatus.PREPARING, version=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['version']), ('PREP', 2))
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "inventory_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"quantity"', updates[0])
+
+        self.update_status(OrderStatus.READY, version=2)
+        response = self.update_status(OrderStatus.COMPLETED, version=3)
+        self.assertEqual(response.data['version'], 4)
+        rollup = SalesRollup.objects.get(menu_item=self.menu_item)
+        self.assertEqual((rollup.quantity, rollup.revenue), (2, 10))
+
+    def test_stale_version_conflicts(self):
+        self.assertEqual(self.update_status(OrderStatus.PREPARING, version=1).status_code, 200)
+        response = self.update_status(OrderStatus.CANCELLED, version=1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['order']['status'], 'PREP')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.version), ('PREP', 2))
+
+        # A concurrent writer moves the row between load and update
+        stale = Order.objects.get(pk=self.order.pk)
+        Order.objects.get(pk=self.order.pk).transition(OrderStatus.READY)
+        with self.assertRaises(OrderConflict):
+            stale.transition(OrderStatus.CANCELLED)
+
+    def test_invalid_transitions_are_rejected(self):
+        response = self.update_status(OrderStatus.COMPLETED)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.update_status('DONE').status_code, 400)
+        self.assertEqual(self.update_status(OrderStatus.PENDING).data['version'], 1)
+
+        # Generic edits cannot change the status, not even along the state machine
+        response = self.client.patch(
+            f'/api/orders/{self.order.id}/', {'status': OrderStatus.PREPARING}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(
+            f'/api/orders/{self.order.id}/', {'customer_name': 'Ada'}, format='json'
+        )
+        self.assertEqual((response.status_code, response.data['version']), (200, 2))
+
+    def test_unchanged_edits_keep_the_version(self):
+        etag = self.client.get(f'/api/orders/{self.order.id}/')['ETag']
+        for data in ({}, {'quantity': self.order.quantity, 'menu_item': str(self.menu_item.id)}):
+            response = self.client.patch(f'/api/orders/{self.order.id}/', data, format='json')
+            self.assertEqual((response.status_code, response.data['version']), (200, 1))
+        # Clients holding the order (or its ETag) are still current
+        response = self.client.get(f'/api/orders/{self.order.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.update_status(OrderStatus.PREPARING, version=1).status_code, 200)
+
+    def test_edits_keep_concurrent_transitions(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        Order.objects.get(pk=self.order.pk).transition(OrderStatus.PREPARING)
+
+        stale.customer_name = 'Ada'
+        stale.save(update_fields=['customer_name'])
+        self.assertEqual(stale.version, 3)
+        self.order.refresh_from_db()
+        self.assertEqual(
+            (self.order.status, self.order.customer_name, self.order.version), ('PREP', 'Ada', 3)
+        )
+        response = self.client.put(
+            f'/api/orders/{self.order.id}/', 
+            {'menu_item': str(self.menu_item.id), 'quantity': 2, 'status': 'PREP', 'customer_name': 'Bo'}, 
+            format='json'
+        )
+        self.assertEqual((response.status_code, response.data['version']), (200, 4))
+
+    def test_change_feed(self):
+        other = Order.objects.create(menu_item=self.menu_item, quantity=1)
+        other.transition(OrderStatus.CANCELLED)
+        
+        async def fetch(params):
+            response = await AsyncClient().get('/api/async/orders/changes/', params)
+            return response.status_code, json.loads(response.content)
+        
+        status_code, data = async_to_sync(fetch)({})
+        self.assertEqual(status_code, 200)
+        self.assertEqual([row['id'] for row in data['results']], [str(self.order.id)])
+        cursor = data['cursor']
+
+        self.order.transition(OrderStatus.PREPARING)
+        status_code, data = async_to_sync(fetch)({'cursor': cursor})
+        # Changes just before the cursor are repeated; the client already has them
+        versions = {row['id']: row['version'] for row in data['results']}
+        self.assertEqual(versions[str(self.order.id)], 2)
+        self.assertGreater(data['cursor'], cursor)
+
+        # Nothing newer: the request waits out its timeout
+        status_code, data = async_to_sync(fetch)({'cursor': data['cursor'], 'timeout': 1})
+        self.assertEqual(status_code, 200)
+        self.assertTrue(all(row['version'] <= 2 for row in data['results']))
+
+        response = self.client.get('/api/async/orders/changes/', {'cursor': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_change_feed_follows_the_running_loop(self):
+        markers = iter(range(1, 100))
+
+        async def latest():
+            return next(markers)
+
+        feed = ChangeFeed(latest, poll_interval=0.01)
+        # Each asyncio.run is a new loop, as after a reload or with
+        # async_to_sync outside ASGI
+        self.assertTrue(asyncio.run(feed.wait(0, 1)))
+        self.assertTrue(asyncio.run(feed.wait(3, 1)))
+        self.assertFalse(asyncio.run(feed.wait(1000, 0.05)))
+
+    @override_settings(DEBUG=True)
+    def test_long_poll_runs_without_sync_adaptation(self):
+        # Django logs every sync middleware or view it wraps for ASGI; any
+        # of them would hold a thread for the whole long-poll
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            handler = BaseHandler()
+            handler.load_middleware(is_async=True)
+            response = async_to_sync(AsyncClient().get)(
+                '/api/async/orders/changes/', {'cursor': timezone.now().isoformat(), 'timeout': 0}
+            )
+        self.assertEqual(response.status_code, 200)
+
+class DatabaseProfileTest(TransactionTestCase):
+    def test_sqlite_connections_apply_configured_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite profile")
+        pragmas = connection.settings_dict['OPTIONS']['pragmas']
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], pragmas['busy_timeout'])
+            cursor.execute("PRAGMA synchronous")
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertNotIn('pragmas', connection.get_connection_params())
+
+    def test_concurrent_order_benchmark(self):
+        # The in-memory test database locks whole tables, so one thread
+        results = bench.compare_database_profiles(concurrency=1, total=4)
+        self.assertEqual(results['configured']['requests'], 4)
+        self.assertEqual(results['configured']['errors'], 0)
+        self.assertEqual(Order.objects.count(), 4 * len(results))
+
+@override_settings(READ_REPLICA_ALIAS='replica', READ_REPLICA_LAG=60)
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.menu_item = MenuItem.objects.create(
+            name="Soup", 
+            price=5.00,
+            preparation_time_minutes=5
+        )
+
+    def replica_queries(self, client, method, path, data=None):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            if method == 'get':
+                response = client.get(path, data)
+            else:
+                response = client.post(path, data, format='json')
+        self.assertLess(response.status_code, 400)
+        return len(queries)
+
+    def test_safe_reads_use_the_replica_outside_the_lag_window(self):
+        client = APIClient()
+        with override_settings(READ_REPLICA_LAG=0):
+            self.assertGreater(self.replica_queries(client, 'get', '/api/menu-items/'), 0)
+            self.assertGreater(
+                self.replica_queries(client, 'get', f'/api/menu-items/{self.menu_item.id}/'), 0
+            )
+        # The menu item was just created, so the replica may not have it
+        # yet: a response stored in the response cache comes from the primary
+        with override_settings(RESPONSE_CACHE_ALIAS='responses'):
+            self.assertEqual(self.replica_queries(client, 'get', '/api/menu-items/'), 0)
+        # Actions that are not listed stay on the primary
+        self.assertEqual(self.replica_queries(client, 'get', '/api/orders/pending_orders/'), 0)
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        writer, reader = APIClient(), APIClient()
+        self.assertGreater(self.replica_queries(writer, 'get', '/api/orders/daily_sales/'), 0)
+
+        self.assertEqual(self.replica_queries(
+            writer, 'post', '/api/orders/', {'menu_item': str(self.menu_item.id), 'quantity': 1}
+        ), 0)
+        self.assertIn(PRIMARY_COOKIE, writer.cookies)
+        self.assertEqual(self.replica_queries(writer, 'get', '/api/orders/daily_sales/'), 0)
+        self.assertGreater(self.replica_queries(reader, 'get', '/api/orders/daily_sales/'), 0)
+
+    def test_recent_writes_keep_uncached_reads_on_the_replica(self):
+        client = APIClient()
+        Order.objects.create(menu_item=self.menu_item, quantity=1)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 0)
+        # The replica may lack the order yet, so nothing to revalidate against
+        self.assertNotIn('ETag', response)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        with override_settings(READ_REPLICA_LAG=0):
+            response = client.get('/api/orders/')
+        self.assertIn('ETag', response)
+        response = client.get('/api/orders/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('ETag', response)
+
+    def test_async_requests_route_reads_around_the_awaited_view(self):
+        aliases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return aliases[-1]
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record), \
+                override_settings(READ_REPLICA_LAG=0):
+            response = async_to_sync(AsyncClient().get)('/api/menu-items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('replica', aliases)
+        # The routing does not leak out of the request
+        self.assertIsNone(read_alias())
+
+class FullTextSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.margherita = MenuItem.objects.create(
+            name="Pizza Margherita", 
+            description="Tomato, mozzarella and basil",
+            price=12.00,
+            preparation_time_minutes=15
+        )
+        self.funghi = MenuItem.objects.create(
+            name="Pizza Funghi", 
+            description="Mushrooms",
+            price=13.00,
+            preparation_time_minutes=15
+        )
+        self.soup = MenuItem.objects.create(
+            name="Tomato Soup", 
+            description="Slow roasted tomato soup",
+            price=6.00,
+            preparation_time_minutes=5
+        )
+
+    def names(self, path, search, **params):
+        response = self.client.get(path, {'search': search, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_terms_and_ranking(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names('/api/menu-items/', 'piz marg'), ["Pizza Margherita"])
+        if connection.vendor == 'sqlite':
+            self.assertTrue(any('inventory_menuitem_fts MATCH' in q['sql'] for q in queries))
+        self.assertEqual(
+            sorted(self.names('/api/menu-items/', 'PIZ')), ["Pizza Funghi", "Pizza Margherita"]
+        )
+        # Best match first unless an ordering is requested
+        self.assertEqual(self.names('/api/menu-items/', 'tomato'), ["Tomato Soup", "Pizza Margherita"])
+        self.assertEqual(
+            self.names('/api/menu-items/', 'tomato', ordering='-price'), 
+            ["Pizza Margherita", "Tomato Soup"]
+        )
+        self.assertEqual(self.names('/api/menu-items/', 'mushroom'), ["Pizza Funghi"])
+        self.assertEqual(self.names('/api/menu-items/', 'zucchini'), [])
+        # No word to search for: nothing is filtered out
+        self.assertEqual(len(self.names('/api/menu-items/', '%% -')), 3)
+
+    def test_index_follows_writes(self):
+        supplier = Supplier.objects.create(
+            name="Green Farm", contact_person="Ada Lovelace", email="ada@greenfarm.example"
+        )
+        self.assertEqual(self.names('/api/suppliers/', 'lovel'), ["Green Farm"])
+        supplier.contact_person = "Grace Hopper"
+        supplier.save()
+        self.assertEqual(self.names('/api/suppliers/', 'lovel'), [])
+        self.assertEqual(self.names('/api/suppliers/', 'greenfarm'), ["Green Farm"])
+
+        order = Order.objects.create(menu_item=self.funghi, customer_name="Table 4")
+        place_orders([{'menu_item': self.soup.pk, 'quantity': 1, 'customer_name': "Table 9"}])
+
+        def customers(search):
+            response = self.client.get('/api/orders/', {'search': search})
+            return sorted(row['customer_name'] for row in response.data['results'])
+
+        self.assertEqual(customers('table'), ["Table 4", "Table 9"])
+        self.assertEqual(customers('fung'), ["Table 4"])
+        # Orders index the menu item name
+        self.funghi.name = "Pizza Porcini"
+        self.funghi.save()
+        self.assertEqual(customers('fung'), [])
+        self.assertEqual(customers('porc 4'), ["Table 4"])
+
+        order.delete()
+        self.assertEqual(customers('table'), ["Table 9"])
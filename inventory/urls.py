@@ -1,12 +1,15 @@
 from django.urls import path, include
 from rest_framework import routers
-from .views import SupplierViewSet, IngredientViewSet, MenuItemViewSet, OrderViewSet
+from .views import SupplierViewSet, IngredientViewSet, MenuItemViewSet, OrderViewSet, StockAlertViewSet, StockMovementViewSet, IngredientLotViewSet
 
 router = routers.DefaultRouter()
 router.register(r'suppliers', SupplierViewSet)
 router.register(r'ingredients', IngredientViewSet)
 router.register(r'menuitems', MenuItemViewSet)
 router.register(r'orders', OrderViewSet)
+router.register(r'stock-alerts', StockAlertViewSet)
+router.register(r'stock-movements', StockMovementViewSet)
+router.register(r'ingredient-lots', IngredientLotViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,24 +1,96 @@
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import F
+from rest_framework.filters import OrderingFilter
+from django.db.models import F, Q, DecimalField, ExpressionWrapper
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 
-from .models import Supplier, Ingredient, MenuItem, Order, OrderStatus
+from .models import (
+    Supplier,
+    Ingredient,
+    MenuItem,
+    RecipeItem,
+    Order,
+    OrderConflict,
+    OrderStatus,
+    SalesRollup,
+    StockAlert,
+    StockMovement,
+    IngredientLot
+)
 from .serializers import (
     SupplierSerializer, 
     IngredientSerializer, 
     MenuItemSerializer, 
-    OrderSerializer
+    OrderSerializer,
+    OrderBatchSerializer,
+    StockAdjustmentSerializer,
+    StockAlertSerializer,
+    StockMovementSerializer,
+    IngredientLotSerializer,
+    LotReceiptSerializer
+)
+from .alerts import alert_events
+from .stock import adjust_stock_levels, place_orders, receive_lots
+from .ledger import stock_at
+from .forecast import reorder_plan
+from .reports import menu_engineering
+from .export import EXPORT_FORMATS, export_response
+from .search import FullTextSearchFilter
+from .pagination import OrderCursorPagination
+from .versions import ConditionalGetMixin
+from .response_cache import CachedResponseMixin, cache_response
+from .read_serializers import (
+    ValuesListMixin,
+    SupplierValuesSerializer,
+    IngredientValuesSerializer,
+    MenuItemValuesSerializer,
+    OrderValuesSerializer
 )
 
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.generic import TemplateView
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Grouping columns for OrderViewSet.sales, as annotations over SalesRollup
+SALES_GROUPINGS = {
+    'day': {'period': F('day')},
+    'week': {'period': TruncWeek('day')},
+    'month': {'period': TruncMonth('day')},
+    'item': {'item_id': F('menu_item'), 'item_name': F('menu_item__name')},
+    'category': {'category': F('menu_item__category')},
+}
 
-class SupplierViewSet(viewsets.ModelViewSet):
+def query_date(request, name, default=None):
+    """
+    The ``name`` query parameter as a date, or ``default`` when it is not
+    given. Raises ValueError when it is given but is not a valid date.
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    return parsed
+
+class SupplierViewSet(ConditionalGetMixin, CachedResponseMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    values_serializer_class = SupplierValuesSerializer
+    version_models = [Supplier]
+    # Safe reads served by the read replica (see inventory.db_routers)
+    replica_actions = {'list', 'retrieve', 'low_rating_suppliers'}
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['category', 'is_active']
     search_fields = ['name', 'contact_person', 'email']
     ordering_fields = ['name', 'rating']
@@ -32,26 +104,71 @@ class SupplierViewSet(viewsets.ModelViewSet):
         return Response({'status': 'supplier deactivated'})
 
     @action(detail=False, methods=['GET'])
+    @cache_response(Supplier)
     def low_rating_suppliers(self, request):
         """Retrieve suppliers with low ratings"""
         low_rating_suppliers = self.queryset.filter(rating__lt=3.0)
         serializer = self.get_serializer(low_rating_suppliers, many=True)
         return Response(serializer.data)
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, CachedResponseMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    values_serializer_class = IngredientValuesSerializer
+    version_models = [Ingredient, Supplier]
+    replica_actions = {'list', 'retrieve', 'low_stock_ingredients'}
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['supplier', 'unit', 'storage_type']
     search_fields = ['name']
     ordering_fields = ['stock_quantity', 'cost_per_unit', 'expiry_date']
 
     @action(detail=False, methods=['GET'])
+    @cache_response(Ingredient, Supplier)
     def low_stock_ingredients(self, request):
         """Retrieve ingredients with low stock"""
         low_stock = self.queryset.filter(stock_quantity__lte=F('minimum_stock_level'))
-        serializer = self.get_serializer(low_stock, many=True)
-        return Response(serializer.data)
+        return self.values_response(low_stock)
+
+    @action(detail=False, methods=['GET'])
+    def reorder_plan(self, request):
+        """Suggested purchases per supplier from forecast consumption"""
+        try:
+            days = int(request.query_params.get('days', 14))
+            history_days = int(request.query_params.get('history_days', 90))
+        except ValueError:
+            days = history_days = 0
+        if not (1 <= days <= 365 and 1 <= history_days <= 3650):
+            return Response(
+                {'error': 'days must be 1-365 and history_days 1-3650'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ingredients = self.filter_queryset(self.get_queryset())
+        return Response(reorder_plan(ingredients, days=days, history_days=history_days))
+
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        """Stream all filtered ingredients as CSV or NDJSON"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': 'Invalid export format'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, [
+            ('id', 'id'),
+            ('name', 'name'),
+            ('supplier', 'supplier'),
+            ('supplier_name', 'supplier__name'),
+            ('stock_quantity', 'stock_quantity'),
+            ('unit', 'unit'),
+            ('minimum_stock_level', 'minimum_stock_level'),
+            ('cost_per_unit', 'cost_per_unit'),
+            ('storage_type', 'storage_type'),
+            ('expiry_date', 'expiry_date'),
+        ], export_format, 'ingredients')
 
     @action(detail=True, methods=['POST'])
     def adjust_stock(self, request, pk=None):
@@ -60,34 +177,129 @@ class IngredientViewSet(viewsets.ModelViewSet):
         quantity = request.data.get('quantity', 0)
         
         try:
-            quantity = float(quantity)
-        except ValueError:
+            quantity = Decimal(str(quantity))
+        except InvalidOperation:
+            return Response(
+                {'error': 'Invalid quantity'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not quantity.is_finite():
             return Response(
                 {'error': 'Invalid quantity'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        ingredient.stock_quantity += quantity
-        ingredient.save()
+        # Applied as a locked update rather than a read-modify-write save
+        try:
+            ingredient, = adjust_stock_levels([{'ingredient': ingredient.pk, 'delta': quantity}])
+        except DjangoValidationError as exc:
+            raise ValidationError(exc.messages)
         
         serializer = self.get_serializer(ingredient)
         return Response(serializer.data)
 
-class MenuItemViewSet(viewsets.ModelViewSet):
-    queryset = MenuItem.objects.all()
+    @action(detail=True, methods=['POST'])
+    def receive(self, request, pk=None):
+        """Book a delivery into stock as a new lot"""
+        ingredient = self.get_object()
+        receipt_serializer = LotReceiptSerializer(data=request.data)
+        receipt_serializer.is_valid(raise_exception=True)
+        
+        try:
+            lot, = receive_lots([{'ingredient': ingredient.pk, **receipt_serializer.validated_data}])
+        except DjangoValidationError as exc:
+            raise ValidationError(exc.messages)
+        
+        lot = IngredientLot.objects.with_status().select_related('ingredient').get(pk=lot.pk)
+        return Response(IngredientLotSerializer(lot).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['POST'])
+    def bulk_adjust(self, request):
+        """Apply many stock deltas or stocktake counts in one transaction"""
+        adjustment_serializer = StockAdjustmentSerializer(
+            data=request.data, 
+            many=True, 
+            allow_empty=False
+        )
+        adjustment_serializer.is_valid(raise_exception=True)
+        
+        try:
+            ingredients = adjust_stock_levels(adjustment_serializer.validated_data)
+        except DjangoValidationError as exc:
+            # One entry per row, like the serializer's own errors
+            raise ValidationError([
+                {api_settings.NON_FIELD_ERRORS_KEY: exc.message_dict[index]}
+                if index in exc.message_dict else {}
+                for index in range(len(adjustment_serializer.validated_data))
+            ])
+        
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['GET'])
+    def stock_at(self, request, pk=None):
+        """Ingredient stock at a point in time (?at=<ISO 8601 datetime>)"""
+        ingredient = self.get_object()
+        try:
+            at = parse_datetime(request.query_params.get('at', ''))
+        except ValueError:
+            at = None
+        if at is None:
+            return Response(
+                {'error': 'Invalid datetime'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        
+        return Response({
+            'ingredient': ingredient.id,
+            'at': at,
+            'stock_quantity': f"{stock_at(ingredient, at):.2f}"
+        })
+
+class MenuItemViewSet(ConditionalGetMixin, CachedResponseMixin, ValuesListMixin, viewsets.ModelViewSet):
+    queryset = MenuItem.objects.prefetch_related('recipe')
     serializer_class = MenuItemSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['category', 'is_vegetarian', 'is_available']
+    values_serializer_class = MenuItemValuesSerializer
+    version_models = [MenuItem, RecipeItem, Ingredient]
+    replica_actions = {'list', 'retrieve'}
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
+    filterset_fields = {
+        'category': ['exact'],
+        'is_vegetarian': ['exact'],
+        'is_available': ['exact'],
+        'servable_portions': ['gte', 'isnull'],
+    }
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'preparation_time_minutes']
 
     @action(detail=False, methods=['GET'])
+    @cache_response(MenuItem, RecipeItem, Ingredient)
     def unavailable_items(self, request):
-        """Retrieve unavailable menu items"""
-        unavailable = self.queryset.filter(is_available=False)
+        """Retrieve menu items that are switched off or out of stock"""
+        unavailable = self.get_queryset().filter(
+            Q(is_available=False) | Q(servable_portions=0)
+        )
         serializer = self.get_serializer(unavailable, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['GET'])
+    @cache_response(SalesRollup, MenuItem, RecipeItem, Ingredient)
+    def engineering(self, request):
+        """Menu engineering report: margin, food cost and quadrant per item"""
+        try:
+            end = query_date(request, 'end', timezone.localdate())
+            start = query_date(request, 'start', end - timedelta(days=6))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        menu_items = self.filter_queryset(MenuItem.objects.all())
+        return Response(menu_engineering(menu_items, start, end))
+
     @action(detail=True, methods=['POST'])
     def toggle_availability(self, request, pk=None):
         """Toggle menu item availability"""
@@ -98,24 +310,72 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(menu_item)
         return Response(serializer.data)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    values_serializer_class = OrderValuesSerializer
+    version_models = [Order, MenuItem]
+    replica_actions = {'list', 'retrieve', 'daily_sales'}
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'menu_item', 'customer_name']
     search_fields = ['customer_name', 'menu_item__name']
     ordering_fields = ['order_date', 'total_price']
+    ordering = ['-order_date', '-id']
+
+    @property
+    def paginator(self):
+        """
+        Page numbers by default; ``?pagination=cursor`` switches to keyset
+        pagination for deep scrolling through the order feed
+        """
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = OrderCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
 
     @action(detail=False, methods=['GET'])
     def pending_orders(self, request):
         """Retrieve pending orders"""
         pending = self.queryset.filter(status='PEND')
-        serializer = self.get_serializer(pending, many=True)
-        return Response(serializer.data)
+        return self.values_response(pending)
+
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        """Stream the filtered order history as CSV or NDJSON"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': 'Invalid export format'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset()).annotate(
+            total=ExpressionWrapper(
+                F('menu_item__price') * F('quantity'), 
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+        return export_response(queryset, [
+            ('id', 'id'),
+            ('menu_item', 'menu_item'),
+            ('menu_item_name', 'menu_item__name'),
+            ('quantity', 'quantity'),
+            ('customer_name', 'customer_name'),
+            ('special_instructions', 'special_instructions'),
+            ('order_date', 'order_date'),
+            ('status', 'status'),
+            ('total_price', 'total'),
+        ], export_format, 'orders')
 
     @action(detail=True, methods=['POST'])
     def update_status(self, request, pk=None):
-        """Update order status"""
+        """
+        Move the order to another status. Pass the ``version`` the client
+        last saw; if the order has changed since, nothing is written and
+        409 is returned with the current order.
+        """
         order = self.get_object()
         new_status = request.data.get('status')
         
@@ -125,28 +385,202 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = new_status
-        order.save()
+        version = request.data.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'Invalid version'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        try:
+            order.transition(new_status, version)
+        except OrderConflict:
+            current = self.get_object()
+            return Response(
+                {
+                    'error': 'Order was changed by another request',
+                    'order': self.get_serializer(current).data
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        except DjangoValidationError as exc:
+            return Response(
+                {'error': exc.messages[0]}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['POST'])
+    def batch(self, request):
+        """Place many orders at once with a single stock deduction"""
+        batch_serializer = OrderBatchSerializer(
+            data=request.data, 
+            many=True, 
+            allow_empty=False
+        )
+        batch_serializer.is_valid(raise_exception=True)
+        
+        try:
+            orders = place_orders(batch_serializer.validated_data)
+        except DjangoValidationError as exc:
+            raise ValidationError(exc.messages)
+        
+        serializer = self.get_serializer(orders, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['GET'])
+    @cache_response(SalesRollup)
     def daily_sales(self, request):
         """Calculate daily sales"""
         from django.db.models import Sum
         from django.utils import timezone
         
-        today = timezone.now().date()
+        today = timezone.localdate()
         daily_sales = (
-            self.queryset
-            .filter(order_date__date=today, status='COMP')
-            .annotate(total=F('menu_item__price') * F('quantity'))
-            .aggregate(total_sales=Sum('total'))
+            SalesRollup.objects
+            .filter(day=today)
+            .aggregate(total_sales=Sum('revenue'))
         )
         
         return Response({'daily_sales': daily_sales['total_sales'] or 0})
 
+    @action(detail=False, methods=['GET'])
+    @cache_response(SalesRollup, MenuItem)
+    def sales(self, request):
+        """Sales over a date range, grouped by item, category, day, week or month"""
+        from django.db.models import Sum
+        
+        group_by = request.query_params.get('group_by', 'day')
+        if group_by not in SALES_GROUPINGS:
+            return Response(
+                {'error': 'Invalid group_by'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            today = timezone.localdate()
+            start = query_date(request, 'start', today)
+            end = query_date(request, 'end', today)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        group_fields = SALES_GROUPINGS[group_by]
+        sales = (
+            SalesRollup.objects
+            .filter(day__range=(start, end))
+            .annotate(**group_fields)
+            .values(*group_fields)
+            .annotate(quantity_sold=Sum('quantity'), revenue_total=Sum('revenue'))
+            .order_by(*group_fields)
+        )
+        
+        return Response({
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'results': [
+                {
+                    **{field: row[field] for field in group_fields},
+                    'quantity': row['quantity_sold'],
+                    'revenue': row['revenue_total'],
+                }
+                for row in sales
+            ],
+        })
+
+class StockAlertViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = StockAlert.objects.select_related('ingredient').order_by('-id')
+    serializer_class = StockAlertSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['ingredient', 'kind']
+    ordering_fields = ['created_at']
+
+class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = StockMovement.objects.select_related('ingredient').order_by('-created_at', '-id')
+    serializer_class = StockMovementSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        'ingredient': ['exact'],
+        'reason': ['exact'],
+        'order': ['exact'],
+        'created_at': ['gte', 'lte'],
+    }
+    ordering_fields = ['created_at']
+
+class IngredientLotViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = IngredientLot.objects.select_related('ingredient').order_by('expiry_date', 'id')
+    serializer_class = IngredientLotSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        'ingredient': ['exact'],
+        'expiry_date': ['gte', 'lte', 'isnull'],
+        'quantity': ['gt'],
+    }
+    ordering_fields = ['expiry_date', 'received_date']
+
+    def get_queryset(self):
+        # Annotated per request: the expiry check compares against today
+        return super().get_queryset().with_status()
+
+    @action(detail=False, methods=['GET'])
+    def expiring_soon(self, request):
+        """Open lots expiring within ?days= (default 3), soonest first"""
+        try:
+            days = int(request.query_params.get('days', 3))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid days'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        today = timezone.localdate()
+        # Range scan on the expiry index; exhausted lots are filtered out
+        # of the (small) range rather than indexed away
+        lots = self.get_queryset().open().filter(
+            expiry_date__range=(today, today + timedelta(days=days))
+        )
+        page = self.paginate_queryset(lots)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(lots, many=True).data)
+
+async def stock_alert_stream(request):
+    """
+    Server-Sent Events feed of new stock alerts. Resumes after the
+    Last-Event-ID header or ?after=<id>; by default only alerts created
+    after connecting are sent. Needs the ASGI application.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'The alert stream is only available under ASGI'}, 
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    if after is None:
+        latest = await StockAlert.objects.order_by('-id').values_list('id', flat=True).afirst()
+        after = latest or 0
+    try:
+        after = int(after)
+    except ValueError:
+        return JsonResponse(
+            {'error': 'Invalid event id'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    response = StreamingHttpResponse(alert_events(after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 class LandingPageView(TemplateView):
     template_name = 'landing.html'
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'inventory.middleware.RequestLogMiddleware',
+    'inventory.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'restaurant_inventory.urls'
@@ -77,13 +79,153 @@ WSGI_APPLICATION = 'restaurant_inventory.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE selects the profile: 'sqlite' (default) or 'postgresql'.
+# Connections are kept open between requests for DB_CONN_MAX_AGE seconds
+# and checked before reuse, so requests skip the connection setup.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'restaurant_inventory'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Set when connecting through a transaction-pooling PgBouncer,
+            # which cannot keep server-side cursors across transactions
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    # See inventory.backends.sqlite3 for the extra OPTIONS
+    DATABASES = {
+        'default': {
+            'ENGINE': 'inventory.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    # Readers no longer block the writer and vice versa
+                    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+                    # Milliseconds a writer waits for the lock before failing
+                    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20000)),
+                    # Durable at every WAL checkpoint rather than every commit
+                    'synchronous': 'NORMAL',
+                    # 64 MiB page cache per connection, 256 MiB memory map
+                    'cache_size': -64000,
+                    'mmap_size': 256 * 1024 * 1024,
+                    'temp_store': 'MEMORY',
+                },
+            },
+        }
     }
+
+# Optional read replica. DB_REPLICA_HOST points PostgreSQL reads at a
+# standby; with SQLite, DB_REPLICA_NAME names a second file refreshed with
+# 'manage.py sync_replica'. Only safe reads of the views that opt in
+# (see inventory.db_routers) use it, and not within READ_REPLICA_LAG
+# seconds of a write.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+if DB_ENGINE == 'postgresql':
+    DATABASES['replica'].update({
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    })
+    READ_REPLICA_ALIAS = 'replica' if os.environ.get('DB_REPLICA_HOST') else None
+else:
+    DATABASES['replica']['NAME'] = os.environ.get('DB_REPLICA_NAME') or DATABASES['default']['NAME']
+    READ_REPLICA_ALIAS = 'replica' if os.environ.get('DB_REPLICA_NAME') else None
+READ_REPLICA_LAG = int(os.environ.get('READ_REPLICA_LAG', 5))
+
+DATABASE_ROUTERS = ['inventory.db_routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'restaurant-inventory',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'restaurant-inventory-responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'responses-file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Model change versions, shared by every worker on the host
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('MODEL_VERSION_CACHE_DIR') or BASE_DIR / 'cache' / 'versions',
+    },
 }
 
+# Per-menu-item ingredient cost/availability, invalidated by signals
+RECIPE_STATS_CACHE_ALIAS = 'default'
+RECIPE_STATS_CACHE_TIMEOUT = 60 * 60
+
+# Per-model change versions behind the API's ETag / Last-Modified headers.
+# Every worker must see the same versions, so this is a cache shared by all
+# processes: 'versions' (files on this host) or a memcached/redis alias when
+# workers run on several hosts. A per-process cache is flagged by
+# 'manage.py check' (inventory.W001).
+MODEL_VERSION_CACHE_ALIAS = os.environ.get('MODEL_VERSION_CACHE_ALIAS') or 'versions'
+
+# Opt-in cache of list and report responses keyed by the model versions
+# above: 'responses' (per process) or 'responses-file' (shared by every
+# worker on the host). Unset disables response caching. A shared response
+# cache needs a shared MODEL_VERSION_CACHE_ALIAS ('manage.py check' refuses
+# the combination, inventory.E001).
+RESPONSE_CACHE_ALIAS = os.environ.get('RESPONSE_CACHE_ALIAS') or None
+RESPONSE_CACHE_TIMEOUT = 10 * 60
+
+# Order in which ingredient lots are used up: 'expiry' (first expiry first)
+# or 'received' (oldest delivery first)
+LOT_CONSUMPTION_ORDER = 'expiry'
+
+# Seconds stock snapshots trail the time they are taken, so movements of
+# transactions still open at that moment are not left out of them
+STOCK_SNAPSHOT_MARGIN = 5 * 60
+
+
+# Request metrics served at /metrics. Point METRICS_MULTIPROCESS_DIR at a
+# directory shared by all workers (e.g. under /dev/shm) when running more
+# than one process so every worker is included in a scrape.
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# When set, RequestLogMiddleware appends every request under
+# REQUEST_CAPTURE_PATHS (method, path, query, body, timing) to this JSONL
+# file for replay with 'manage.py replay'. Passwords, tokens and similar
+# fields are masked (inventory.replay.SENSITIVE_FIELDS).
+REQUEST_CAPTURE_FILE = os.environ.get('REQUEST_CAPTURE_FILE')
+REQUEST_CAPTURE_PATHS = ('/api/',)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
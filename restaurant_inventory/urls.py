@@ -6,7 +6,19 @@ from inventory.views import (
     IngredientViewSet, 
     MenuItemViewSet, 
     OrderViewSet,
-    LandingPageView
+    StockAlertViewSet,
+    StockMovementViewSet,
+    IngredientLotViewSet,
+    LandingPageView,
+    stock_alert_stream
+)
+from inventory.metrics import metrics_view
+from inventory.async_views import (
+    AsyncSupplierView,
+    AsyncIngredientView,
+    AsyncMenuItemView,
+    AsyncPendingOrderView,
+    AsyncOrderChangesView
 )
 
 router = DefaultRouter()
@@ -14,9 +26,23 @@ router.register(r'suppliers', SupplierViewSet)
 router.register(r'ingredients', IngredientViewSet)
 router.register(r'menu-items', MenuItemViewSet)
 router.register(r'orders', OrderViewSet)
+router.register(r'stock-alerts', StockAlertViewSet)
+router.register(r'stock-movements', StockMovementViewSet)
+router.register(r'ingredient-lots', IngredientLotViewSet)
 
 urlpatterns = [
     path('', LandingPageView.as_view(), name='landing'),
     path('admin/', admin.site.urls),
+    path('api/stock-alerts/stream/', stock_alert_stream, name='stock-alert-stream'),
+    # Async read-only endpoints for high fan-out displays (serve with ASGI)
+    path('api/async/suppliers/', AsyncSupplierView.as_view()),
+    path('api/async/suppliers/<str:pk>/', AsyncSupplierView.as_view()),
+    path('api/async/ingredients/', AsyncIngredientView.as_view()),
+    path('api/async/ingredients/<str:pk>/', AsyncIngredientView.as_view()),
+    path('api/async/menu-items/', AsyncMenuItemView.as_view()),
+    path('api/async/menu-items/<str:pk>/', AsyncMenuItemView.as_view()),
+    path('api/async/orders/pending/', AsyncPendingOrderView.as_view()),
+    path('api/async/orders/changes/', AsyncOrderChangesView.as_view(), name='order-changes'),
     path('api/', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
 ]